@@ -0,0 +1,219 @@
+###########################################################################################################
+# File: catalog.py
+#
+# ThreatQuotient Proprietary and Confidential
+# Copyright (c) 2016-2026 ThreatQuotient, Inc. All rights reserved.
+#
+# NOTICE: All information contained herein, is, and remains the property of ThreatQuotient, Inc.
+# The intellectual and technical concepts contained herein are proprietary to ThreatQuotient, Inc.
+# and its suppliers and may be covered by U.S. and Foreign Patents, patents in process, and are
+# protected by trade secret or copyright law.
+#
+# Dissemination of this information or reproduction of this material is strictly forbidden unless prior
+# written permission is obtained from ThreatQuotient, Inc.
+#
+# Licensed under Apache 2.0 (https://www.apache.org/licenses/LICENSE-2.0.txt)
+###########################################################################################################
+
+import json
+import os
+import time
+from copy import deepcopy
+from logging import getLogger
+
+from .tq_mappings import threatq_objects
+
+
+_logger = getLogger(__name__)
+
+# Bump when the format of the catalog files changes, to ignore older files
+CATALOG_VERSION = 1
+
+# Vocabularies of the metadata registry listing the types and statuses of objects
+OBJECT_VOCABULARIES = {
+    "indicator": {"types": "indicator_types", "statuses": "indicator_statuses"},
+    "event": {"types": "event_types"},
+    "signature": {"types": "signature_types"},
+}
+
+
+def flatten_string(value):
+    """
+    Flattens a string by removing any new lines, underscores, spaces,
+    and then making sure it's lowercase
+
+    Parameters:
+        - value (str): The string to "flatten"
+
+    Returns: A flattened string
+    """
+
+    value = value.replace("\n", "").replace("_", "").replace(" ", "")
+    return value.lower()
+
+
+class Catalog:
+    """
+    The ThreatQ object types, with their types and statuses, indexed by their
+    flattened names for user-input matching
+    """
+
+    def __init__(self, objects, source="static"):
+        self.objects = objects
+        self.source = source
+
+        # The first object with a matching name wins, as with a linear scan
+        self.objects_by_name = {}
+        self.types_by_name = {}
+        for obj in objects:
+            for field in ("display_name", "name", "display_name_plural", "collection"):
+                if obj.get(field):
+                    self.objects_by_name.setdefault(flatten_string(obj[field]), obj)
+
+            types = self.types_by_name.setdefault(obj["name"], {})
+            for i in obj.get("types") or []:
+                types.setdefault(flatten_string(i["name"]), i["name"])
+
+    def match_object(self, name):
+        """
+        Matches a user-input to an object
+
+        Parameters:
+            - name (str): A string to match to an object name
+
+        Returns: The object's details, or an empty dictionary if there is no match
+        """
+
+        return self.objects_by_name.get(flatten_string(name), {})
+
+    def match_type(self, object_name, name):
+        """
+        Matches a user-input to one of an object's types
+
+        Parameters:
+            - object_name (str): Name of the object, e.g. "indicator"
+            - name (str): A string to match to a type
+
+        Returns: The type's name, or None if there is no match
+        """
+
+        return self.types_by_name.get(object_name, {}).get(flatten_string(name))
+
+
+_catalog = Catalog(threatq_objects)
+
+
+def get_catalog():
+    """
+    Gets the catalog used for matching user-input
+
+    Returns: The current Catalog
+    """
+
+    return _catalog
+
+
+def use_catalog(catalog):
+    """
+    Sets the catalog used for matching user-input
+
+    Parameters:
+        - catalog (Catalog): The catalog to use
+    """
+
+    global _catalog
+    _catalog = catalog
+
+
+def fetch_catalog_objects(tq):
+    """
+    Fetches the object types of a ThreatQ instance, along with their types and
+    statuses, on top of the static catalog
+
+    Parameters:
+        - tq (Threatq): ThreatQ connection
+
+    Returns: A list of objects in the format of the static catalog
+    """
+
+    objects = {obj["name"]: deepcopy(obj) for obj in threatq_objects}
+    for item in tq.get("/api/objects").get("data", []):
+        if not item.get("name") or not item.get("collection"):
+            continue
+
+        obj = objects.setdefault(item["name"], {"name": item["name"], "types": [], "statuses": []})
+        obj["collection"] = item["collection"]
+        obj["display_name"] = item.get("display_name") or obj.get("display_name") or item["name"]
+        obj["display_name_plural"] = item.get("display_name_plural") or obj.get("display_name_plural") or obj["display_name"]
+
+    for name, vocabularies in OBJECT_VOCABULARIES.items():
+        if name not in objects:
+            continue
+
+        for field, vocabulary in vocabularies.items():
+            loaded = tq.metadata.get(vocabulary)
+            if loaded and loaded.by_id:
+                objects[name][field] = [{"id": oid, "name": value} for oid, value in loaded.by_id.items()]
+
+    return list(objects.values())
+
+
+def _read_catalog_file(path):
+    try:
+        with open(path) as inf:
+            data = json.load(inf)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(data, dict) or data.get("version") != CATALOG_VERSION or not isinstance(data.get("objects"), list):
+        return None
+
+    return data
+
+
+def _write_catalog_file(path, objects):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w") as outf:
+            json.dump({"version": CATALOG_VERSION, "fetched_at": time.time(), "objects": objects}, outf)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        _logger.debug(f"Failed to write catalog {path}: {e}")
+
+
+def load_catalog(tq, path, max_age=86400):
+    """
+    Loads the catalog of a ThreatQ instance and uses it for matching user-input.
+
+    The catalog is fetched from ThreatQ at most once every `max_age` seconds,
+    and kept in `path` in between. If it can't be fetched, the last catalog
+    kept is used, or else the static catalog.
+
+    Parameters:
+        - tq (Threatq): ThreatQ connection
+        - path (str): Path of the file to keep the catalog in
+        - max_age (int): Seconds before the catalog is fetched again
+
+    Returns: The Catalog now in use
+    """
+
+    cached = _read_catalog_file(path)
+    if cached and time.time() - cached.get("fetched_at", 0) < max_age:
+        catalog = Catalog(cached["objects"], source="cache")
+    else:
+        try:
+            objects = fetch_catalog_objects(tq)
+        except Exception as e:
+            _logger.debug(f"Failed to fetch the ThreatQ catalog: {e}")
+            objects = None
+
+        if objects:
+            _write_catalog_file(path, objects)
+            catalog = Catalog(objects, source="server")
+        elif cached:
+            catalog = Catalog(cached["objects"], source="cache")
+        else:
+            catalog = Catalog(threatq_objects)
+
+    use_catalog(catalog)
+    return catalog
@@ -21,8 +21,9 @@ from copy import copy
 
 from six import string_types
 
+from .catalog import flatten_string, get_catalog
 from .indicator_parser import IndicatorParser
-from .tq_mappings import object_types, statused_objects, threatq_objects, typed_objects
+from .tq_mappings import object_types, statused_objects, typed_objects
 
 
 class Utils:
@@ -260,15 +261,7 @@ class Utils:
         Returns: String, corresponding with an object's API name
         """
 
-        for obj in threatq_objects:
-            if (
-                Utils.flatten_string(name) == Utils.flatten_string(obj["display_name"])
-                or Utils.flatten_string(name) == Utils.flatten_string(obj["name"])
-                or Utils.flatten_string(name) == Utils.flatten_string(obj["display_name_plural"])
-                or Utils.flatten_string(name) == Utils.flatten_string(obj["collection"])
-            ):
-                return obj
-        return {}
+        return get_catalog().match_object(name)
 
     @staticmethod
     def match_name_to_indicator_type(name):
@@ -283,14 +276,7 @@ class Utils:
         Returns: String, corresponding with an indicator's type
         """
 
-        for obj in threatq_objects:
-            # Skip over any non-indicator types
-            if obj["name"] != "indicator":
-                continue
-
-            for i in obj.get("types", []):
-                if Utils.flatten_string(i["name"]) == Utils.flatten_string(name):
-                    return i["name"]
+        return get_catalog().match_type("indicator", name)
 
     @staticmethod
     def match_name_to_event_type(name):
@@ -305,14 +291,7 @@ class Utils:
         Returns: String, corresponding with an indicator's type
         """
 
-        for obj in threatq_objects:
-            # Skip over any non-event
-            if obj["name"] != "event":
-                continue
-
-            for i in obj.get("types", []):
-                if Utils.flatten_string(i["name"]) == Utils.flatten_string(name):
-                    return i["name"]
+        return get_catalog().match_type("event", name)
 
     @staticmethod
     def match_assignee(assignee, tq_users):
@@ -352,8 +331,7 @@ class Utils:
         Returns: A flattened string
         """
 
-        value = value.replace("\n", "").replace("_", "").replace(" ", "")
-        return value.lower()
+        return flatten_string(value)
 
     @staticmethod
     def sanitize_indicator(value):
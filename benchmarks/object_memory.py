@@ -0,0 +1,128 @@
+###########################################################################################################
+# File: object_memory.py
+#
+# ThreatQuotient Proprietary and Confidential
+# Copyright (c) 2016-2026 ThreatQuotient, Inc. All rights reserved.
+#
+# NOTICE: All information contained herein, is, and remains the property of ThreatQuotient, Inc.
+# The intellectual and technical concepts contained herein are proprietary to ThreatQuotient, Inc.
+# and its suppliers and may be covered by U.S. and Foreign Patents, patents in process, and are
+# protected by trade secret or copyright law.
+#
+# Dissemination of this information or reproduction of this material is strictly forbidden unless prior
+# written permission is obtained from ThreatQuotient, Inc.
+#
+# Licensed under Apache 2.0 (https://www.apache.org/licenses/LICENSE-2.0.txt)
+###########################################################################################################
+"""Measure the memory and time taken to build ThreatQ objects from API responses
+
+Run from the root of the repository::
+
+    python benchmarks/object_memory.py [--baseline REV] [count]
+
+With ``--baseline``, the ``threatqsdk`` package of the git revision ``REV``
+is measured as well, e.g. ``e285e14^`` for the objects before they used
+``__slots__``, and the saving is printed.
+"""
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = [
+    ("Indicator with type, status, score and one source", "sourced_indicator"),
+    ("Indicator with value and type only", "bare_indicator"),
+]
+
+
+def sourced_indicator(i):
+    return {
+        "id": i,
+        "value": f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}",
+        "type": {"name": "IP Address"},
+        "status": {"name": "Active"},
+        "score": {"generated_score": "5"},
+        "sources": [{"name": "Phantom", "tlp_id": 3}],
+    }
+
+
+def bare_indicator(i):
+    return {"id": i, "value": f"h{i}.example.com", "type": {"name": "FQDN"}}
+
+
+def measure(responses):
+    """Build an indicator from each response
+
+    :returns: ``dict`` of the bytes traced per object, and the seconds taken to build and serialize the objects
+    """
+    from threatqsdk.bulk_object import ThreatQObject
+
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    objects = [ThreatQObject(None, "indicators").fill_from_api_response(response) for response in responses]
+    built = time.perf_counter() - started
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for obj in objects:
+        obj._to_dict()
+    serialized = time.perf_counter() - started
+
+    return {"bytes": traced // len(objects), "built": built, "serialized": serialized}
+
+
+def measure_all(count):
+    return [measure([globals()[factory](i) for i in range(count)]) for _, factory in CASES]
+
+
+def measure_revision(revision, count):
+    """Measure the ``threatqsdk`` package of a git revision, in a separate interpreter"""
+    with tempfile.TemporaryDirectory() as directory:
+        archive = subprocess.run(["git", "archive", revision, "threatqsdk"], cwd=ROOT, check=True, capture_output=True).stdout
+        subprocess.run(["tar", "-x", "-C", directory], input=archive, check=True)
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--sdk", directory, "--json", str(count)], check=True, capture_output=True
+        ).stdout
+
+    return json.loads(output)
+
+
+def describe(result):
+    return f"{result['bytes']} bytes/object, built in {result['built']:.2f}s, serialized in {result['serialized']:.2f}s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("count", nargs="?", type=int, default=200000, help="Number of objects to build")
+    parser.add_argument("--baseline", metavar="REV", help="Git revision to compare with")
+    parser.add_argument("--sdk", default=ROOT, help=argparse.SUPPRESS)
+    parser.add_argument("--json", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sys.path.insert(0, args.sdk)
+    results = measure_all(args.count)
+    if args.json:
+        print(json.dumps(results))
+        return
+
+    baselines = measure_revision(args.baseline, args.count) if args.baseline else [None] * len(CASES)
+    for (label, _), result, baseline in zip(CASES, results, baselines):
+        print(f"{label}: {describe(result)}")
+        if baseline:
+            saving = 1 - result["bytes"] / baseline["bytes"]
+            print(f"  {args.baseline}: {describe(baseline)}. {saving:.0%} less memory")
+
+
+if __name__ == "__main__":
+    main()
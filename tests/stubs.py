@@ -0,0 +1,59 @@
+"""Stand-ins for a ThreatQ connection, shared by the tests"""
+
+import json
+
+from requests import Response
+from requests.exceptions import HTTPError
+
+
+class ConsumeThreatq:
+    """Accepts consume batches, unless they hold one of the bad values
+
+    Each object is given a new ID, and returned with the value and type it
+    was uploaded with. The uploaded objects are kept in ``uploaded``.
+
+    :param dict type_ids: IDs of the indicator types. When given, objects are
+        returned with the ``type_id`` of their type instead of its name, as
+        ThreatQ may do, and the types are available through ``metadata``.
+    """
+
+    def __init__(self, bad_values=(), status=400, type_ids=None):
+        self.bad_values = set(bad_values)
+        self.status = status
+        self.type_ids = type_ids
+        self.metadata = StubMetadata({"indicator_types": type_ids or {}})
+        self.requests = 0
+        self.uploaded = []
+
+    def post(self, endpoint, body=None, deadline=None):
+        self.requests += 1
+        items = json.loads(body)
+        if any(item.get("value") in self.bad_values for item in items):
+            response = Response()
+            response.status_code = self.status
+            raise HTTPError(f"{self.status} Client Error", response=response)
+
+        data = []
+        for item in items:
+            self.uploaded.append(item)
+            returned = {"id": len(self.uploaded), "value": item.get("value")}
+            if self.type_ids is None:
+                returned["type"] = item.get("type")
+            else:
+                returned["type_id"] = self.type_ids[item["type"]["name"]]
+            data.append(returned)
+
+        return {"data": data}
+
+
+class StubMetadata:
+    """Looks up the names of vocabulary entries, like :py:class:`~threatqsdk.metadata.MetadataRegistry`
+
+    :param dict vocabularies: Maps each vocabulary to a ``dict`` of entry IDs by name
+    """
+
+    def __init__(self, vocabularies):
+        self.vocabularies = vocabularies
+
+    def name_of(self, vocabulary, oid):
+        return next((name for name, entry_id in self.vocabularies.get(vocabulary, {}).items() if entry_id == oid), None)
@@ -0,0 +1,67 @@
+import unittest
+
+from tests.stubs import ConsumeThreatq
+from threatqsdk.bulk_object import ThreatQObject
+from threatqsdk.upload import UploadReport
+
+
+def indicators(count):
+    objects = []
+    for i in range(count):
+        obj = ThreatQObject(None, "indicators")
+        obj.set_value(f"v{i}")
+        obj.type = "FQDN"
+        objects.append(obj)
+
+    return objects
+
+
+class BulkUploadSplitTest(unittest.TestCase):
+    def test_bad_objects_in_both_halves(self):
+        objects = indicators(1000)
+        report = UploadReport()
+        ThreatQObject.bulk_upload(ConsumeThreatq(["v3", "v300"]), objects, show_debug=False, max_batch_objects=1000, report=report)
+
+        self.assertEqual(sorted(failure.identifier for failure in report.failures), ["v3", "v300"])
+        self.assertEqual([obj.value for obj in objects if not obj.oid], ["v3", "v300"])
+
+    def test_too_large_in_both_halves(self):
+        objects = indicators(8)
+        report = UploadReport()
+        ThreatQObject.bulk_upload(ConsumeThreatq(["v0", "v7"], status=413), objects, show_debug=False, max_batch_objects=8, report=report)
+
+        self.assertEqual([failure.identifier for failure in report.failures], ["v0", "v7"])
+        self.assertEqual(sum(1 for obj in objects if obj.oid), 6)
+
+    def test_other_errors_fail_the_batch(self):
+        objects = indicators(8)
+        tq = ConsumeThreatq(["v0"], status=403)
+        report = UploadReport()
+        ThreatQObject.bulk_upload(tq, objects, show_debug=False, max_batch_objects=8, report=report)
+
+        self.assertEqual(len(report.failures), 8)
+        self.assertEqual(tq.requests, 1)
+
+
+class ReconciliationTest(unittest.TestCase):
+    def upload_abc(self, tq):
+        objects = []
+        for type_name in ("String", "Username"):
+            obj = ThreatQObject(None, "indicators")
+            obj.set_value("abc")
+            obj.type = type_name
+            objects.append(obj)
+
+        ThreatQObject.bulk_upload(tq, objects, show_debug=False)
+        ids = {item["type"]["name"]: i + 1 for i, item in enumerate(tq.uploaded)}
+        return {obj.type: obj.oid for obj in objects}, ids
+
+    def test_same_value_under_two_types(self):
+        assigned, ids = self.upload_abc(ConsumeThreatq())
+        self.assertEqual(len(set(ids.values())), 2)
+        self.assertEqual(assigned, ids)
+
+    def test_same_value_returned_with_type_ids(self):
+        assigned, ids = self.upload_abc(ConsumeThreatq(type_ids={"String": 7, "Username": 9}))
+        self.assertEqual(len(set(ids.values())), 2)
+        self.assertEqual(assigned, ids)
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+
+from requests import Response
+
+from threatqsdk.cache import ResponseCache
+
+
+def response(body, etag='"1"'):
+    r = Response()
+    r.status_code = 200
+    r._content = body
+    r.headers["ETag"] = etag
+    return r
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def test_keys_are_per_user(self):
+        cache = ResponseCache()
+        alice = cache.make_key("/api/users", {"limit": 10}, user="client|alice@example.com")
+        bob = cache.make_key("/api/users", {"limit": 10}, user="client|bob@example.com")
+        self.assertNotEqual(alice, bob)
+        self.assertNotIn("alice", alice)
+
+        cache.store(alice, response(b'{"data": []}'))
+        self.assertIsNotNone(cache.get(alice))
+        self.assertIsNone(cache.get(bob))
+
+    def test_memory_only_by_default(self):
+        cache = ResponseCache()
+        key = cache.make_key("/api/indicator/types")
+        cache.store(key, response(b'{"data": []}'))
+        self.assertEqual(cache.get(key)["etag"], '"1"')
+        self.assertIsNone(cache.directory)
+
+    def test_only_lookups_are_cached(self):
+        cache = ResponseCache()
+        self.assertTrue(cache.caches("/api/indicator/types"))
+        self.assertTrue(cache.caches("/api/users/"))
+        self.assertFalse(cache.caches("/api/indicators"))
+        self.assertFalse(cache.caches("/api/events/12/indicators"))
+
+    def test_large_responses_are_not_cached(self):
+        cache = ResponseCache(max_body_size=16)
+        key = cache.make_key("/api/users")
+        cache.store(key, response(b'{"data": ["' + b"x" * 16 + b'"]}'))
+        self.assertIsNone(cache.get(key))
+
+    def test_directory_is_trimmed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResponseCache(maxsize=16, directory=directory)
+            for i in range(40):
+                cache.store(cache.make_key(f"/api/{i}"), response(b"{}"))
+
+            # Trimmed every 2 writes
+            self.assertLessEqual(len(os.listdir(directory)), 17)
+            self.assertEqual(ResponseCache(maxsize=16, directory=directory).get(cache.make_key("/api/39"))["body"], "{}")
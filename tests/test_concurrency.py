@@ -0,0 +1,51 @@
+import asyncio
+import threading
+import unittest
+
+from threatqsdk.concurrency import AsyncThreatq, RequestSpec, fan_out
+
+
+class StubThreatq:
+    pool_maxsize = 4
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.release = threading.Barrier(2)
+
+    def get(self, endpoint, withp=None, params=None):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.release.wait(timeout=1)
+        with self.lock:
+            self.in_flight -= 1
+        return {"data": endpoint}
+
+    def post(self, endpoint, data=None, files=None, params=None, body=None, deadline=None):
+        if endpoint.endswith("/missing"):
+            raise ValueError(endpoint)
+        return {"data": body if body is not None else data}
+
+
+class AsyncThreatqTest(unittest.TestCase):
+    def test_post_body(self):
+        with AsyncThreatq(StubThreatq()) as atq:
+            res = asyncio.run(atq.post("/api/indicators/consume", body=b"[]"))
+        self.assertEqual(res, {"data": b"[]"})
+
+    def test_run_batch(self):
+        tq = StubThreatq()
+        specs = [RequestSpec("get", "/api/a"), RequestSpec("get", "/api/b"), RequestSpec("post", "/api/missing", {"data": {}})]
+        with AsyncThreatq(tq, concurrency=2) as atq:
+            results = atq.run_batch(specs)
+
+        self.assertEqual([outcome.result for outcome in results], [{"data": "/api/a"}, {"data": "/api/b"}, None])
+        self.assertIsInstance(results[2].error, ValueError)
+        self.assertEqual(tq.max_in_flight, 2)
+
+    def test_fan_out(self):
+        results = fan_out(StubThreatq(), [RequestSpec("post", "/api/tasks", {"data": {"name": "a"}})])
+        self.assertEqual(results[0].result, {"data": {"name": "a"}})
+        self.assertIsNone(results[0].error)
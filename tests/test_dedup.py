@@ -0,0 +1,93 @@
+import unittest
+
+from tests.stubs import ConsumeThreatq
+from threatqsdk.bulk_object import ThreatQAttribute, ThreatQObject
+
+
+def indicator(value="10.0.0.1", type_name="IP Address"):
+    obj = ThreatQObject(None, "indicators")
+    obj.set_value(value)
+    obj.type = type_name
+    return obj
+
+
+def related(oid):
+    obj = ThreatQObject(None, "events")
+    obj.oid = oid
+    return obj
+
+
+class MergeObjectsTest(unittest.TestCase):
+    def test_last_set_field_wins(self):
+        first = indicator()
+        first.description = "First"
+        first.status = "Active"
+        first.score = 3
+        second = indicator()
+        second.description = "Second"
+        second.status = ""
+        third = indicator()
+        third.status = None
+
+        merged = ThreatQObject.merge_objects([first, second, third])
+        self.assertEqual(merged.description, "Second")
+        self.assertEqual(merged.status, "Active")
+        self.assertEqual(merged.score, 3)
+        self.assertEqual((merged.value, merged.type), ("10.0.0.1", "IP Address"))
+
+    def test_combines_without_duplicates(self):
+        first = indicator()
+        first.add_source("Phantom", tlp=3)
+        first.add_attribute("Severity", "High", sources="a")
+        first.add_tags(["malware", "c2"])
+        first.relate_object(related(1))
+        second = indicator()
+        second.add_source("Phantom", tlp=2)
+        second.add_source("Feed")
+        second.add_attribute("Severity", "High", sources="b")
+        second.add_attribute("Severity", "Low")
+        second.add_tags(["c2", "botnet"])
+        second.relate_object(related(1))
+        second.relate_object(related(2))
+
+        merged = ThreatQObject.merge_objects([first, second])
+        data = merged._to_dict()
+        self.assertEqual([(src["name"], src.get("tlp_id")) for src in data["sources"]], [("Phantom", 2), ("Feed", None)])
+        self.assertEqual([(attr["name"], attr["value"]) for attr in data["attributes"]], [("Severity", "High"), ("Severity", "Low")])
+        self.assertEqual([src["name"] for src in data["attributes"][0]["sources"]], ["a", "b"])
+        self.assertEqual(data["tags"], ["malware", "c2", "botnet"])
+        self.assertEqual(data["events"], [{"id": 1}, {"id": 2}])
+
+    def test_leaves_objects_unchanged(self):
+        first = indicator()
+        first.add_attribute(ThreatQAttribute("Severity", "High", sources="a"))
+        second = indicator()
+        second.add_attribute(ThreatQAttribute("Severity", "High", sources="b"))
+
+        ThreatQObject.merge_objects([first, second])._to_dict()
+        self.assertEqual([src.name for src in first.attributes[0].sources], ["a"])
+        self.assertEqual(len(first.attributes), 1)
+
+
+class BulkUploadDedupTest(unittest.TestCase):
+    def test_duplicates_get_the_merged_id(self):
+        duplicates = [indicator() for _ in range(3)]
+        duplicates[1].add_source("Feed")
+        other = indicator("example.com", "FQDN")
+
+        tq = ConsumeThreatq()
+        ThreatQObject.bulk_upload(tq, [*duplicates, other], show_debug=False)
+
+        self.assertEqual([item["value"] for item in tq.uploaded], ["10.0.0.1", "example.com"])
+        self.assertEqual([src["name"] for src in tq.uploaded[0]["sources"]], ["Feed"])
+        self.assertEqual([obj.oid for obj in duplicates], [1, 1, 1])
+        self.assertEqual(other.oid, 2)
+
+    def test_same_value_with_other_type_is_kept(self):
+        objects = [indicator("abc", "String"), indicator("abc", "Username"), indicator("abc", "String")]
+
+        tq = ConsumeThreatq()
+        ThreatQObject.bulk_upload(tq, objects, show_debug=False)
+
+        self.assertEqual(len(tq.uploaded), 2)
+        self.assertEqual([obj.oid for obj in objects], [1, 2, 1])
@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+from tests.stubs import ConsumeThreatq
+from threatqsdk.journal import UploadJournal
+
+
+class UploadJournalDrainTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.journal = UploadJournal(os.path.join(directory.name, "journal.db"), max_attempts=1)
+
+    def test_bad_entries_in_both_halves(self):
+        self.journal.append("indicators", [{"value": f"v{i}", "type": {"name": "FQDN"}} for i in range(400)])
+
+        uploaded = self.journal.drain(ConsumeThreatq(["v3", "v300"]), max_batch_objects=400)
+
+        self.assertEqual(uploaded, 398)
+        self.assertEqual(self.journal.pending(), 0)
+        with self.journal._connect() as db:
+            self.assertEqual(db.execute("SELECT COUNT(*) FROM entries").fetchone()[0], 0)
+
+    def test_keeps_bad_entries_for_later_drains(self):
+        self.journal.max_attempts = 2
+        self.journal.append("indicators", [{"value": f"v{i}", "type": {"name": "FQDN"}} for i in range(16)])
+
+        self.assertEqual(self.journal.drain(ConsumeThreatq(["v0", "v15"]), max_batch_objects=16), 14)
+        with self.journal._connect() as db:
+            self.assertEqual(db.execute("SELECT COUNT(*) FROM entries").fetchone()[0], 2)
+
+    def test_stops_when_out_of_time(self):
+        self.journal.append("indicators", [{"value": f"v{i}", "type": {"name": "FQDN"}} for i in range(4)])
+
+        tq = ConsumeThreatq([])
+        self.assertEqual(self.journal.drain(tq, max_seconds=0), 0)
+        self.assertEqual(tq.requests, 0)
+        self.assertEqual(self.journal.pending(), 4)
+        self.assertEqual(self.journal.drain(tq), 4)
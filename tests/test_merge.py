@@ -0,0 +1,67 @@
+import unittest
+
+from threatqsdk.bulk_object import ThreatQAttribute, ThreatQObject, ThreatQSource
+
+
+class MergeSourcesTest(unittest.TestCase):
+    def test_lower_tlp_wins(self):
+        amber = ThreatQSource("Phantom", tlp=2)
+        merged = ThreatQSource.merge_sources([ThreatQSource("Phantom", tlp=3), amber, ThreatQSource("Phantom", tlp=4)])
+        self.assertEqual(merged, [amber])
+
+    def test_tlp_wins_over_none(self):
+        green = ThreatQSource("Phantom", tlp="green")
+        merged = ThreatQSource.merge_sources([ThreatQSource("Phantom"), green, ThreatQSource("Phantom")])
+        self.assertEqual(merged, [green])
+
+    def test_equal_tlp_keeps_first(self):
+        first = ThreatQSource("Phantom", tlp=3)
+        self.assertEqual(ThreatQSource.merge_sources([first, ThreatQSource("Phantom", tlp=3)]), [first])
+        first = ThreatQSource("Phantom")
+        self.assertEqual(ThreatQSource.merge_sources([first, ThreatQSource("Phantom")]), [first])
+
+    def test_keeps_first_seen_order(self):
+        sources = [ThreatQSource(name, tlp=tlp) for name, tlp in (("b", None), ("a", 3), ("c", 4), ("a", 1), ("b", 2))]
+        merged = ThreatQSource.merge_sources(sources)
+        self.assertEqual([(src.name, src.tlp) for src in merged], [("b", 2), ("a", 1), ("c", 4)])
+
+    def test_keeps_other_items(self):
+        other = {"name": "Phantom"}
+        source = ThreatQSource("Phantom")
+        self.assertEqual(ThreatQSource.merge_sources([other, source, None]), [other, source, None])
+
+
+class MergeAttributesTest(unittest.TestCase):
+    def test_merges_duplicates_of_first_attribute(self):
+        first = ThreatQAttribute("Severity", "High", sources="a")
+        merged = ThreatQAttribute.merge_attributes(
+            [first, ThreatQAttribute("Severity", "High", sources="b"), ThreatQAttribute("Severity", "Low")]
+        )
+        self.assertEqual([(attr.name, attr.value) for attr in merged], [("Severity", "High"), ("Severity", "Low")])
+        self.assertIs(merged[0], first)
+        self.assertEqual([src.name for src in first.sources], ["a", "b"])
+
+    def test_keeps_unhashable_values(self):
+        attrs = [ThreatQAttribute("Tags", ["a"]), ThreatQAttribute("Tags", ["a"])]
+        self.assertEqual(ThreatQAttribute.merge_attributes(attrs), attrs)
+
+
+class MergeToDictTest(unittest.TestCase):
+    def test_large_object(self):
+        obj = ThreatQObject(None, "indicators")
+        obj.set_value("10.0.0.1")
+        obj.type = "IP Address"
+        for i in range(5000):
+            obj.add_attribute(f"Attribute {i % 50}", f"Value {i % 100}", sources=f"Source {i % 7}")
+            obj.add_source(f"Source {i % 200}", tlp=4 - i // 200 % 4)
+
+        data = obj._to_dict()
+        self.assertEqual(len(data["attributes"]), 100)
+        self.assertEqual([len(attr["sources"]) for attr in data["attributes"]], [7] * 100)
+        self.assertEqual(len(data["sources"]), 200)
+        self.assertEqual([src["name"] for src in data["sources"][:3]], ["Source 0", "Source 1", "Source 2"])
+        self.assertEqual({src["tlp_id"] for src in data["sources"]}, {1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+from threatqsdk import Threatq
+
+
+class StubThreatq(Threatq):
+    """Serves a list endpoint, returning at most ``max_limit`` objects per page
+
+    :param dict short: Number of objects returned at given offsets, instead of the limit
+    :param bool offsets: False to ignore the offset, always returning the first page
+    """
+
+    def __init__(self, count, max_limit, total=None, short=None, offsets=True):
+        self.items = list(range(count))
+        self.max_limit = max_limit
+        self.total = total
+        self.short = short or {}
+        self.honor_offsets = offsets
+        self.offsets = []
+
+    def get(self, endpoint, withp=None, params=None):
+        offset = params["offset"]
+        self.offsets.append(offset)
+        limit = self.short.get(offset, min(params["limit"], self.max_limit))
+        if not self.honor_offsets:
+            offset = 0
+        res = {"data": self.items[offset : offset + limit]}
+        if self.total is not False:
+            res["total"] = len(self.items) if self.total is None else self.total
+        return res
+
+
+class IterPagesTest(unittest.TestCase):
+    def test_server_caps_the_limit(self):
+        tq = StubThreatq(23, max_limit=5)
+        self.assertEqual(list(tq.iter_pages("/api/indicators", page_size=10)), list(range(23)))
+        self.assertEqual(tq.offsets, [0, 5, 10, 15, 20])
+
+    def test_prefetch_with_capped_limit(self):
+        tq = StubThreatq(23, max_limit=5)
+        self.assertEqual(list(tq.iter_pages("/api/indicators", page_size=10, prefetch=3)), list(range(23)))
+
+    def test_prefetch_with_short_page(self):
+        tq = StubThreatq(23, max_limit=10, short={10: 4})
+        self.assertEqual(list(tq.iter_pages("/api/indicators", page_size=10, prefetch=3)), list(range(23)))
+
+    def test_short_page_without_total(self):
+        tq = StubThreatq(23, max_limit=10, total=False)
+        self.assertEqual(list(tq.iter_pages("/api/indicators", page_size=10)), list(range(23)))
+        self.assertEqual(tq.offsets, [0, 10, 20])
+
+    def test_empty_page_before_total(self):
+        tq = StubThreatq(12, max_limit=10, total=23)
+        self.assertEqual(list(tq.iter_pages("/api/indicators", page_size=10)), list(range(12)))
+        self.assertEqual(tq.offsets, [0, 10, 12])
+
+    def test_callers_limit(self):
+        tq = StubThreatq(12, max_limit=100, total=False)
+        self.assertEqual(list(tq.iter_pages("/api/users", params={"limit": 5})), list(range(12)))
+        self.assertEqual(tq.offsets, [0, 5, 10])
+
+    def test_endpoint_ignoring_the_limit(self):
+        tq = StubThreatq(25, max_limit=100, total=False, short={0: 100})
+        self.assertEqual(list(tq.iter_pages("/api/users", page_size=10)), list(range(25)))
+        self.assertEqual(tq.offsets, [0])
+
+    def test_endpoint_ignoring_the_offset(self):
+        tq = StubThreatq(25, max_limit=100, total=False, offsets=False)
+        self.assertEqual(list(tq.iter_pages("/api/users", page_size=10)), list(range(10)))
+        self.assertEqual(tq.offsets, [0, 10])
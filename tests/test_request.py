@@ -0,0 +1,69 @@
+import threading
+import time
+import unittest
+
+from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout
+
+from threatqsdk import Threatq
+from threatqsdk.breaker import CircuitBreaker
+from threatqsdk.ratelimit import RateLimiter
+from threatqsdk.retry import RetryPolicy
+
+
+class StubAuth:
+    accesstoken = "token"
+
+    def is_token_expired(self):
+        return False
+
+
+class StubSession:
+    """Fails every request with a connection error"""
+
+    def __init__(self):
+        self.timeouts = []
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.timeouts.append(timeout)
+        raise RequestsConnectionError("Connection refused")
+
+
+class StubThreatq(Threatq):
+    def __init__(self, timeout=(10, 300), backoff_base=1):
+        self.threatq_host = "https://tq"
+        self.timeout = timeout
+        self.compression = None
+        self.auth = StubAuth()
+        self.session = StubSession()
+        self.retry_policy = RetryPolicy(max_attempts=4, backoff_base=backoff_base)
+        self.rate_limiter = RateLimiter()
+        self.circuit_breaker = CircuitBreaker(failure_threshold=0)
+        self._local = threading.local()
+
+
+class DeadlineTest(unittest.TestCase):
+    def test_timeout_is_cut_to_the_deadline(self):
+        tq = StubThreatq(timeout=(2, 300), backoff_base=0.01)
+        with self.assertRaises(RequestsConnectionError):
+            tq.post("/api/indicators/consume", body=b"[]", deadline=time.monotonic() + 5)
+
+        self.assertEqual(len(tq.session.timeouts), 4)
+        for connect, read in tq.session.timeouts:
+            self.assertEqual(connect, 2)
+            self.assertLessEqual(read, 5)
+
+    def test_no_retry_past_the_deadline(self):
+        tq = StubThreatq(backoff_base=60)
+        started = time.monotonic()
+        with self.assertRaises(RequestsConnectionError):
+            tq.post("/api/indicators/consume", body=b"[]", deadline=started + 0.5)
+
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(len(tq.session.timeouts), 1)
+
+    def test_deadline_passed(self):
+        tq = StubThreatq()
+        with self.assertRaises(Timeout):
+            tq.post("/api/indicators/consume", body=b"[]", deadline=time.monotonic())
+
+        self.assertEqual(tq.session.timeouts, [])
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+
+from threatqsdk.authentication import TokenHolder
+from threatqsdk.token_store import FileTokenStore
+
+
+class StubResponse:
+    status_code = 200
+
+    def __init__(self, token):
+        self.token = token
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"access_token": self.token, "refresh_token": f"refresh-{self.token}", "expires_in": 3600}
+
+
+class StubSession:
+    def __init__(self):
+        self.grants = []
+
+    def post(self, url, params=None, **kwargs):
+        self.grants.append(params["grant_type"])
+        return StubResponse(f"token-{len(self.grants)}")
+
+
+AUTH = {"clientid": "client", "auth": {"email": "analyst@example.com", "password": "secret"}}  # pragma: allowlist secret
+
+
+class TokenStoreTest(unittest.TestCase):
+    def test_shares_tokens(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = FileTokenStore(os.path.join(directory, "tokens.json"))
+            session = StubSession()
+            first = TokenHolder("https://tq", AUTH, False, session, token_store=store)
+            second = TokenHolder("https://tq", AUTH, False, session, token_store=store)
+
+        self.assertEqual(second.accesstoken, first.accesstoken)
+        self.assertEqual(session.grants, ["password"])
+
+    def test_unwritable_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = FileTokenStore(os.path.join(directory, "missing", "tokens.json"))
+            with store.lock() as locked:
+                self.assertFalse(locked)
+
+            session = StubSession()
+            holder = TokenHolder("https://tq", AUTH, False, session, token_store=store)
+            self.assertEqual(holder.accesstoken, "token-1")
+
+            holder.refresh()
+            self.assertEqual(holder.accesstoken, "token-2")
+            self.assertEqual(session.grants, ["password", "refresh_token"])
@@ -39,9 +39,27 @@ from phantom.base_connector import BaseConnector
 
 # ThreatQ imports
 from api import Utils
+from api.catalog import load_catalog
 from api.tq_mappings import object_types
 from threatq_consts import *
-from threatqsdk import Event, File, Threatq, ThreatQAttribute, ThreatQObject, ThreatQSource
+from threatqsdk import (
+    CircuitBreaker,
+    Event,
+    File,
+    FileTokenStore,
+    RateLimiter,
+    RequestSpec,
+    ResponseCache,
+    RetryPolicy,
+    Threatq,
+    ThreatQAttribute,
+    ThreatQObject,
+    ThreatQSource,
+)
+from threatqsdk.concurrency import fan_out, run_concurrently
+from threatqsdk.journal import UploadJournal
+from threatqsdk.shared_state import make_shared_path
+from threatqsdk.upload import UploadReport, is_overload
 
 
 class ObjectContextType:
@@ -65,6 +83,8 @@ class ThreatQConnector(BaseConnector):
         # Call the BaseConnector to "extend" it
         super().__init__()
         self.tq = None
+        self.upload_settings = {}
+        self.journal = None
 
         # Create action mapping
         self.action_map = {
@@ -115,7 +135,180 @@ class ThreatQConnector(BaseConnector):
 
         return error_text
 
-    def _handle_test_connectivity(self, host, auth_data, verify=True, oauth=False):
+    @staticmethod
+    def _format_traceback(e):
+        """
+        Formats the traceback of an exception raised in another thread
+
+        Parameters:
+            - e (Exception): The exception
+
+        Returns: Traceback string
+        """
+        return "".join(traceback.format_exception(type(e), e, e.__traceback__))
+
+    def _validate_integer(self, value, key, allow_zero=False):
+        """
+        Validates that a configuration value is a positive integer
+
+        Parameters:
+            - value (any): The value to validate
+            - key (str): The name of the configuration value, for the error message
+            - allow_zero (bool): Whether zero is an acceptable value
+
+        Returns: The value as an integer
+        """
+
+        error_message = THREATQ_ERROR_INVALID_NON_NEGATIVE_INTEGER if allow_zero else THREATQ_ERROR_INVALID_INTEGER
+
+        try:
+            if float(value) != int(float(value)):
+                raise ValueError
+            value = int(float(value))
+        except (TypeError, ValueError):
+            raise ValueError(error_message.format(key=key))
+
+        if value < 0 or (value == 0 and not allow_zero):
+            raise ValueError(error_message.format(key=key))
+
+        return value
+
+    def _get_connection_settings(self, config):
+        """
+        Builds the connection settings for the ThreatQ client from the asset configuration
+
+        Parameters:
+            - config (dict): The asset configuration
+
+        Returns: Dictionary of keyword arguments for Threatq
+        """
+
+        connect_timeout = self._validate_integer(config.get("connect_timeout", THREATQ_DEFAULT_CONNECT_TIMEOUT), "connect_timeout")
+        read_timeout = self._validate_integer(config.get("read_timeout", THREATQ_DEFAULT_READ_TIMEOUT), "read_timeout")
+        max_retries = self._validate_integer(config.get("max_retries", THREATQ_DEFAULT_MAX_RETRIES), "max_retries", allow_zero=True)
+        requests_per_second = self._validate_integer(config.get("requests_per_second", 0), "requests_per_second", allow_zero=True)
+        max_in_flight = self._validate_integer(config.get("max_in_flight", 0), "max_in_flight", allow_zero=True)
+
+        breaker_threshold = self._validate_integer(
+            config.get("circuit_breaker_threshold", THREATQ_DEFAULT_CIRCUIT_BREAKER_THRESHOLD), "circuit_breaker_threshold", allow_zero=True
+        )
+        breaker_reset = self._validate_integer(
+            config.get("circuit_breaker_reset", THREATQ_DEFAULT_CIRCUIT_BREAKER_RESET), "circuit_breaker_reset"
+        )
+
+        cache_ttl = self._validate_integer(
+            config.get("response_cache_ttl", THREATQ_DEFAULT_RESPONSE_CACHE_TTL), "response_cache_ttl", allow_zero=True
+        )
+
+        compression = config.get("request_compression", THREATQ_DEFAULT_REQUEST_COMPRESSION)
+        if compression not in THREATQ_REQUEST_COMPRESSION_LIST:
+            raise ValueError(THREATQ_ERROR_INVALID_REQUEST_COMPRESSION.format(options=", ".join(THREATQ_REQUEST_COMPRESSION_LIST)))
+
+        # Share the rate limit between all the app's processes on this host
+        shared_path = None
+        if requests_per_second and config.get("shared_rate_limit", False):
+            shared_path = make_shared_path(self.get_state_dir(), "ratelimit", config["tq_server"])
+
+        # Always share the circuit state, so an outage is only detected once per host
+        breaker_path = make_shared_path(self.get_state_dir(), "circuit", config["tq_server"])
+
+        # Cache responses in memory, and only share them between action runs on request
+        response_cache = None
+        if cache_ttl:
+            cache_dir = None
+            if config.get("shared_response_cache", False):
+                cache_dir = make_shared_path(self.get_state_dir(), "cache", config["tq_server"], suffix="")
+            response_cache = ResponseCache(ttl=cache_ttl, directory=cache_dir)
+
+        return {
+            "pool_connections": self._validate_integer(config.get("pool_connections", THREATQ_DEFAULT_POOL_CONNECTIONS), "pool_connections"),
+            "pool_maxsize": self._validate_integer(config.get("pool_maxsize", THREATQ_DEFAULT_POOL_MAXSIZE), "pool_maxsize"),
+            "timeout": (connect_timeout, read_timeout),
+            "keepalive": config.get("tcp_keepalive", True),
+            "retry_policy": RetryPolicy(max_attempts=max_retries + 1),
+            "rate_limiter": RateLimiter(rate=requests_per_second, max_in_flight=max_in_flight, shared_path=shared_path),
+            "circuit_breaker": CircuitBreaker(failure_threshold=breaker_threshold, reset_timeout=breaker_reset, shared_path=breaker_path),
+            "compression": None if compression == "none" else compression,
+            "response_cache": response_cache,
+        }
+
+    def _get_upload_settings(self, config):
+        """
+        Builds the bulk upload settings from the asset configuration
+
+        Parameters:
+            - config (dict): The asset configuration
+
+        Returns: Dictionary of keyword arguments for ThreatQObject.bulk_upload
+        """
+
+        batch_size = self._validate_integer(config.get("upload_batch_size", THREATQ_DEFAULT_UPLOAD_BATCH_SIZE), "upload_batch_size")
+        batch_kb = self._validate_integer(config.get("upload_batch_kb", THREATQ_DEFAULT_UPLOAD_BATCH_KB), "upload_batch_kb")
+        concurrency = self._validate_integer(config.get("upload_concurrency", THREATQ_DEFAULT_UPLOAD_CONCURRENCY), "upload_concurrency")
+
+        return {"max_batch_objects": batch_size, "max_batch_bytes": batch_kb * 1024, "concurrency": concurrency}
+
+    def _add_upload_failures(self, action_result, report):
+        """
+        Adds the objects which failed to upload to the action summary
+
+        Parameters:
+            - action_result (ActionResult): The action result to update
+            - report (UploadReport): The report passed to ThreatQObject.bulk_upload
+        """
+
+        if not report.failures:
+            return
+
+        # Queue the objects which failed because ThreatQ is unavailable, to upload them later
+        if self.journal:
+            unavailable = {}
+            for failure in report.failures:
+                if is_overload(failure.error):
+                    unavailable.setdefault(failure.api_name, []).append(failure)
+
+            queued = set()
+            for api_name, failures in unavailable.items():
+                try:
+                    self.journal.append(api_name, [failure.item for failure in failures])
+                except Exception as e:
+                    self.debug_print(f"Failed to queue [{api_name}] objects. {self._get_error_message_from_exception(e)}")
+                    continue
+                queued.update(id(failure) for failure in failures)
+
+            if queued:
+                report.failures = [failure for failure in report.failures if id(failure) not in queued]
+                self.save_progress(f"ThreatQ is unavailable. Queued [{len(queued)}] object(s) to be uploaded later")
+                action_result.update_summary({"queued": len(queued)})
+
+            if not report.failures:
+                return
+
+        self.save_progress(f"Failed to upload [{len(report.failures)}] object(s)")
+        action_result.update_summary({"failed": len(report.failures), "failures": report.summary()})
+
+    def _drain_journal(self):
+        """
+        Uploads the objects queued while ThreatQ was unavailable
+        """
+
+        try:
+            uploaded = self.journal.drain(
+                self.tq,
+                max_entries=THREATQ_JOURNAL_DRAIN_LIMIT,
+                max_seconds=THREATQ_JOURNAL_DRAIN_SECONDS,
+                max_batch_objects=self.upload_settings["max_batch_objects"],
+                max_batch_bytes=self.upload_settings["max_batch_bytes"],
+            )
+        except Exception as e:
+            error_message = self._get_error_message_from_exception(e)
+            self.debug_print(f"Failed to upload queued objects. {error_message} -- {traceback.format_exc()}")
+            return
+
+        if uploaded:
+            self.debug_print(f"Uploaded [{uploaded}] queued object(s) to ThreatQ")
+
+    def _handle_test_connectivity(self, host, auth_data, verify=True, oauth=False, settings=None):
         """
         Tests the connectivity to ThreatQ
 
@@ -124,6 +317,7 @@ class ThreatQConnector(BaseConnector):
             - auth_data (dict): Authentication data for ThreatQ
             - verify (bool): Whether to verify SSL or not
             - oauth (bool): Whether to authenticate using OAuth credentials or not
+            - settings (dict): Connection settings for ThreatQ
 
         Returns: A Phantom status response
         """
@@ -133,9 +327,15 @@ class ThreatQConnector(BaseConnector):
         self.save_progress("Attempting to authenticate...")
         self.save_progress(phantom.APP_PROG_CONNECTING_TO_ELLIPSES, host)
 
+        # Always try to connect, even if the circuit was opened by earlier failures (e.g. a misconfigured asset)
+        settings = dict(settings or {})
+        breaker = settings.pop("circuit_breaker", None)
+
         try:
-            Threatq(host, auth_data, verify=verify, private=oauth)
+            Threatq(host, auth_data, verify=verify, private=oauth, **settings)
             self.save_progress(THREATQ_SUCCESS_CONNECTIVITY_TEST)
+            if breaker is not None:
+                breaker.record_success()
             return action_result.set_status(phantom.APP_SUCCESS)
         except Exception as e:
             error_message = unquote_plus(self._get_error_message_from_exception(e))
@@ -282,8 +482,9 @@ class ThreatQConnector(BaseConnector):
             obj.add_source(source_obj)
             indicators.append(obj)
 
+        report = UploadReport()
         try:
-            ThreatQObject.bulk_upload(self.tq, indicators)
+            ThreatQObject.bulk_upload(self.tq, indicators, report=report, **self.upload_settings)
         except Exception as e:
             error_message = self._get_error_message_from_exception(e)
             msg = f"{error_message} -- {traceback.format_exc()}"
@@ -291,6 +492,8 @@ class ThreatQConnector(BaseConnector):
             action_result.set_status(phantom.APP_ERROR, THREATQ_ERROR_BULK_UPLOAD.format(error=error_message))
             return action_result
 
+        self._add_upload_failures(action_result, report)
+
         uploaded = [ind for ind in indicators if ind.oid]
         msg = f"Successfully uploaded [{len(uploaded)}] indicator(s)"
 
@@ -413,8 +616,9 @@ class ThreatQConnector(BaseConnector):
             indicators.append(obj)
 
         # Upload indicator list
+        report = UploadReport()
         try:
-            ThreatQObject.bulk_upload(self.tq, indicators)
+            ThreatQObject.bulk_upload(self.tq, indicators, report=report, **self.upload_settings)
         except Exception as e:
             error_message = self._get_error_message_from_exception(e)
             msg = f"{error_message} -- {traceback.format_exc()}"
@@ -422,19 +626,20 @@ class ThreatQConnector(BaseConnector):
             action_result.set_status(phantom.APP_ERROR, THREATQ_ERROR_BULK_UPLOAD.format(error=error_message))
             return action_result
 
+        self._add_upload_failures(action_result, report)
+
         uploaded_inds = [ind for ind in indicators if ind.oid]
 
         # Relate indicators to task
         if uploaded_inds:
             self.save_progress(f"Relating [{len(uploaded_inds)}] indicators to the task")
 
+        specs = [RequestSpec("post", f"{i._get_api_endpoint()}/tasks", {"data": [{"id": res["id"]}]}) for i in uploaded_inds]
         failed_count = 0
-        for i in uploaded_inds:
-            try:
-                self.tq.post(f"{i._get_api_endpoint()}/tasks", data=[{"id": res["id"]}])
-            except Exception as e:
-                error_message = self._get_error_message_from_exception(e)
-                msg = f"{THREATQ_ERROR_RELATE_INDICATOR_TO_TASK.format(i)}. {error_message} -- {traceback.format_exc()}"
+        for i, outcome in zip(uploaded_inds, fan_out(self.tq, specs)):
+            if outcome.error:
+                error_message = self._get_error_message_from_exception(outcome.error)
+                msg = f"{THREATQ_ERROR_RELATE_INDICATOR_TO_TASK.format(i)}. {error_message} -- {self._format_traceback(outcome.error)}"
                 self.debug_print(msg)
                 failed_count += 1
 
@@ -580,8 +785,9 @@ class ThreatQConnector(BaseConnector):
             indicators.append(obj)
 
         # Upload indicator list
+        report = UploadReport()
         try:
-            ThreatQObject.bulk_upload(self.tq, indicators)
+            ThreatQObject.bulk_upload(self.tq, indicators, report=report, **self.upload_settings)
         except Exception as e:
             error_message = self._get_error_message_from_exception(e)
             msg = f"{error_message} -- {traceback.format_exc()}"
@@ -589,6 +795,8 @@ class ThreatQConnector(BaseConnector):
             action_result.set_status(phantom.APP_ERROR, THREATQ_ERROR_BULK_UPLOAD.format(error=error_message))
             return action_result
 
+        self._add_upload_failures(action_result, report)
+
         # Add data and summary to output result
         output = event._to_dict(for_api=False)
         action_result.update_summary({"total": 1, "results": [Utils.generate_summary(output)]})
@@ -884,8 +1092,9 @@ class ThreatQConnector(BaseConnector):
             indicators.append(obj)
 
         # Upload indicator list
+        report = UploadReport()
         try:
-            ThreatQObject.bulk_upload(self.tq, indicators)
+            ThreatQObject.bulk_upload(self.tq, indicators, report=report, **self.upload_settings)
         except Exception as e:
             error_message = self._get_error_message_from_exception(e)
             msg = f"{error_message} -- {traceback.format_exc()}"
@@ -893,6 +1102,8 @@ class ThreatQConnector(BaseConnector):
             action_result.set_status(phantom.APP_ERROR, THREATQ_ERROR_BULK_UPLOAD.format(error=error_message))
             return action_result
 
+        self._add_upload_failures(action_result, report)
+
         uploaded_inds = [ind for ind in indicators if ind.oid]
 
         # Create the investigation
@@ -922,15 +1133,14 @@ class ThreatQConnector(BaseConnector):
 
         # Link the indicators as nodes to the investigation
         self.save_progress("Adding indicator nodes to investigation")
+        endpoint = "/api/investigations/{}/nodes".format(res["id"])
+        specs = [RequestSpec("post", endpoint, {"data": {"object_id": ind.oid, "object_type": "indicator"}}) for ind in uploaded_inds]
         failed_count = 0
-        for ind in uploaded_inds:
-            data = {"object_id": ind.oid, "object_type": "indicator"}
-            try:
-                self.tq.post("/api/investigations/{}/nodes".format(res["id"]), data=data)
-            except Exception as e:
-                error_message = self._get_error_message_from_exception(e)
-                msg = f"{THREATQ_ERROR_RELATE_INDICATOR_TO_INVESTIGATION.format(ind)}. {error_message} -- {traceback.format_exc()}"
-                self.debug_print(msg)
+        for ind, outcome in zip(uploaded_inds, fan_out(self.tq, specs)):
+            if outcome.error:
+                error_message = self._get_error_message_from_exception(outcome.error)
+                msg = f"{THREATQ_ERROR_RELATE_INDICATOR_TO_INVESTIGATION.format(ind)}. {error_message}"
+                self.debug_print(f"{msg} -- {self._format_traceback(outcome.error)}")
                 failed_count += 1
 
         # If all the indices failed while linking indicator to investigation, the action will fail and return
@@ -1014,8 +1224,9 @@ class ThreatQConnector(BaseConnector):
             obj.add_source(source_obj)
             objects.append(obj)
 
+        report = UploadReport()
         try:
-            ThreatQObject.bulk_upload(self.tq, objects)
+            ThreatQObject.bulk_upload(self.tq, objects, report=report, **self.upload_settings)
         except Exception as e:
             error_message = self._get_error_message_from_exception(e)
             msg = f"{error_message} -- {traceback.format_exc()}"
@@ -1023,6 +1234,8 @@ class ThreatQConnector(BaseConnector):
             action_result.set_status(phantom.APP_ERROR, THREATQ_ERROR_BULK_UPLOAD.format(error=error_message))
             return action_result
 
+        self._add_upload_failures(action_result, report)
+
         uploaded = [ind for ind in objects if ind.oid]
         msg = f"Successfully uploaded [{len(uploaded)}] adversaries"
 
@@ -1117,10 +1330,11 @@ class ThreatQConnector(BaseConnector):
             objects[obj.api_name].append(obj)
 
         # Upload the objects
+        report = UploadReport()
         uploaded = []
         for objs in objects.values():
             try:
-                ThreatQObject.bulk_upload(self.tq, objs)
+                ThreatQObject.bulk_upload(self.tq, objs, report=report, **self.upload_settings)
             except Exception as e:
                 error_message = self._get_error_message_from_exception(e)
                 msg = f"{THREATQ_ERROR_BULK_UPLOAD.format(error=error_message)} -- {traceback.format_exc()}"
@@ -1130,6 +1344,8 @@ class ThreatQConnector(BaseConnector):
             uploaded.extend([u_obj for u_obj in objs if u_obj.oid])
             self.save_progress(f"Successfully uploaded [{len(uploaded)}] {objs[0].api_name} objects")
 
+        self._add_upload_failures(action_result, report)
+
         # Create action result summary
         action_result.update_summary({"total": len(uploaded)})
 
@@ -1282,10 +1498,11 @@ class ThreatQConnector(BaseConnector):
             objects[obj.api_name].append(obj)
 
         # Upload the objects
+        report = UploadReport()
         uploaded = []
         for objs in objects.values():
             try:
-                ThreatQObject.bulk_upload(self.tq, objs)
+                ThreatQObject.bulk_upload(self.tq, objs, report=report, **self.upload_settings)
             except Exception as e:
                 error_message = self._get_error_message_from_exception(e)
                 msg = f"{THREATQ_ERROR_BULK_UPLOAD.format(error=error_message)} -- {traceback.format_exc()}"
@@ -1294,6 +1511,8 @@ class ThreatQConnector(BaseConnector):
 
             uploaded.extend([u_obj for u_obj in objs if u_obj.oid])
 
+        self._add_upload_failures(action_result, report)
+
         msg = f"Successfully added {context_type}(s) to [{len(uploaded)}] objects"
 
         # Create action result summary
@@ -1351,49 +1570,62 @@ class ThreatQConnector(BaseConnector):
             action_result.set_status(phantom.APP_ERROR, THREATQ_ERROR_PARSE_OBJECT_LIST.format(error=error_message))
             return action_result
 
+        base_obj = obj_data.get("collection")
+        related_obj = related_obj_data.get("collection")
+
+        # Look up all the items, then all their related objects, concurrently
+        self.save_progress(
+            "Querying for the related {} of [{}] {}".format(
+                related_obj_data.get("display_name_plural"), len(items), obj_data.get("display_name_plural")
+            )
+        )
+        lookups = run_concurrently(
+            lambda item: self.query_object_details(base_obj, item, exact=True, relationships=False), items, self.tq.pool_maxsize
+        )
+        found = [lookup.result[0] for lookup in lookups if lookup.result]
+
+        # Share the connection pool between the objects and the pages of their related objects,
+        # so no more requests are in flight than there are connections
+        workers = max(1, min(len(found), self.tq.pool_maxsize))
+        prefetch = min(THREATQ_RELATED_PAGE_PREFETCH, self.tq.pool_maxsize // workers)
+        prefetch = prefetch if prefetch > 1 else 0
+
+        def get_related(obj):
+            endpoint = f"/api/{base_obj}/{obj.oid}/{related_obj}"
+            return list(self.tq.iter_pages(endpoint, withp="attributes", prefetch=prefetch))
+
+        related_lookups = iter(run_concurrently(get_related, found, workers))
+
         results = []
-        for index, item in enumerate(items):
+        for lookup in lookups:
             # Add action results
             action_result = ActionResult(dict(params))
 
-            base_obj = obj_data.get("collection")
-            related_obj = related_obj_data.get("collection")
-
-            # Get results from ThreatQ
-            self.save_progress(
-                "Querying for {}'s related {} - {}/{}".format(
-                    obj_data.get("display_name"), related_obj_data.get("display_name_plural"), index + 1, len(items)
-                )
-            )
-
-            try:
-                result = self.query_object_details(base_obj, item, exact=True, relationships=False)
-            except Exception as e:
-                error_message = self._get_error_message_from_exception(e)
-                msg = f"{error_message} -- {traceback.format_exc()}"
+            if lookup.error:
+                error_message = self._get_error_message_from_exception(lookup.error)
+                msg = f"{error_message} -- {self._format_traceback(lookup.error)}"
                 self.debug_print(msg)
                 action_result.set_status(phantom.APP_ERROR, THREATQ_ERROR_QUERY_OBJECT_DETAILS.format(error=error_message))
                 results.append(action_result)
                 continue
 
-            if not result:
+            if not lookup.result:
                 action_result.set_status(phantom.APP_SUCCESS, THREATQ_NO_DATA)
                 results.append(action_result)
                 continue
 
             related_objects = []
 
-            try:
-                related_res = self.tq.get(f"/api/{base_obj}/{result[0].oid}/{related_obj}", withp="attributes").get("data", [])
-            except Exception as e:
-                error_message = self._get_error_message_from_exception(e)
-                msg = f"{error_message} -- {traceback.format_exc()}"
+            related_lookup = next(related_lookups)
+            if related_lookup.error:
+                error_message = self._get_error_message_from_exception(related_lookup.error)
+                msg = f"{error_message} -- {self._format_traceback(related_lookup.error)}"
                 self.debug_print(msg)
                 action_result.set_status(phantom.APP_ERROR, THREATQ_ERROR_GET_RELATED_OBJECTS.format(error=error_message))
                 results.append(action_result)
                 continue
 
-            for rel in related_res:
+            for rel in related_lookup.result:
                 rel_obj = ThreatQObject(self.tq, related_obj)
                 rel_obj.fill_from_api_response(rel)
                 related_objects.append(rel_obj)
@@ -1530,8 +1762,9 @@ class ThreatQConnector(BaseConnector):
 
         # Upload the objects
         self.save_progress(f"Uploading [{len(indicators)}] indicators")
+        report = UploadReport()
         try:
-            ThreatQObject.bulk_upload(self.tq, indicators)
+            ThreatQObject.bulk_upload(self.tq, indicators, report=report, **self.upload_settings)
         except Exception as e:
             error_message = self._get_error_message_from_exception(e)
             msg = f"{error_message} -- {traceback.format_exc()}"
@@ -1539,6 +1772,8 @@ class ThreatQConnector(BaseConnector):
             action_result.set_status(phantom.APP_ERROR, THREATQ_ERROR_BULK_UPLOAD.format(error=error_message))
             return action_result
 
+        self._add_upload_failures(action_result, report)
+
         uploaded = [ind for ind in indicators if ind.oid]
 
         # Set the status manually
@@ -1546,13 +1781,12 @@ class ThreatQConnector(BaseConnector):
         if uploaded:
             self.save_progress(f"Setting status of [{len(uploaded)}] indicators to [{indicator_status}]")
 
+        specs = [RequestSpec("put", i._get_api_endpoint(), {"data": payload}) for i in uploaded]
         failed_count = 0
-        for i in uploaded:
-            try:
-                self.tq.put(i._get_api_endpoint(), data=payload)
-            except Exception as e:
-                error_message = self._get_error_message_from_exception(e)
-                msg = f"{THREATQ_ERROR_SET_INDICATOR_STATUS.format(i)}. {error_message} -- {traceback.format_exc()}"
+        for i, outcome in zip(uploaded, fan_out(self.tq, specs)):
+            if outcome.error:
+                error_message = self._get_error_message_from_exception(outcome.error)
+                msg = f"{THREATQ_ERROR_SET_INDICATOR_STATUS.format(i)}. {error_message} -- {self._format_traceback(outcome.error)}"
                 self.debug_print(msg)
                 failed_count += 1
 
@@ -1658,17 +1892,24 @@ class ThreatQConnector(BaseConnector):
         # Compile "with" parameters
         params = {identifier: value, "with": Utils.build_with_params(object_type, relationships=relationships)}
 
-        # Send the request
-        res = self.tq.get(f"/api/{object_type}", params=params)
+        # Send the request, following all the result pages
+        data = list(self.tq.iter_pages(f"/api/{object_type}", params=params))
 
-        results = []
-        for i in res.get("data", []):
-            # Get "bugged" objects via direct endpoint
-            if relationships:
-                for obj_type in object_types:
-                    if "_" in obj_type:
-                        i[obj_type] = self.tq.get("/api/{}/{}/{}".format(object_type, i["id"], obj_type)).get("data", [])
+        # Get "bugged" objects via direct endpoint, concurrently
+        if relationships and data:
+            bugged_types = [obj_type for obj_type in object_types if "_" in obj_type]
+            endpoints = ["/api/{}/{}/{}".format(object_type, i["id"], obj_type) for i in data for obj_type in bugged_types]
+            responses = iter(run_concurrently(lambda endpoint: list(self.tq.iter_pages(endpoint)), endpoints, self.tq.pool_maxsize))
 
+            for i in data:
+                for obj_type in bugged_types:
+                    related = next(responses)
+                    if related.error:
+                        raise related.error
+                    i[obj_type] = related.result
+
+        results = []
+        for i in data:
             obj = ThreatQObject(self.tq, object_type)
             obj.fill_from_api_response(i)
             results.append(obj)
@@ -1704,14 +1945,26 @@ class ThreatQConnector(BaseConnector):
         if trust_ssl and "REQUESTS_CA_BUNDLE" in os.environ:
             del os.environ["REQUESTS_CA_BUNDLE"]
 
+        try:
+            settings = self._get_connection_settings(config)
+            self.upload_settings = self._get_upload_settings(config)
+        except ValueError as e:
+            error_message = self._get_error_message_from_exception(e)
+            self.debug_print(error_message)
+            action_result = self.add_action_result(ActionResult(dict(params)))
+            return action_result.set_status(phantom.APP_ERROR, error_message)
+
         # Check if we are testing connectivity through the UI
         if action_id == phantom.ACTION_ID_TEST_ASSET_CONNECTIVITY:
-            status = self._handle_test_connectivity(tq_host, auth_data, verify=(not trust_ssl))
+            status = self._handle_test_connectivity(tq_host, auth_data, verify=(not trust_ssl), settings=settings)
             return status
 
+        # Share OAuth tokens between action runs, so each run doesn't need a new token
+        token_store = FileTokenStore(os.path.join(self.get_state_dir(), THREATQ_TOKEN_STORE_FILE))
+
         try:
             # Re-authenticate with ThreatQ
-            self.tq = Threatq(tq_host, auth_data, verify=(not trust_ssl))
+            self.tq = Threatq(tq_host, auth_data, verify=(not trust_ssl), token_store=token_store, **settings)
         except Exception as e:
             error_message = unquote_plus(self._get_error_message_from_exception(e))
             msg = f"{error_message} -- {traceback.format_exc()}"
@@ -1719,6 +1972,19 @@ class ThreatQConnector(BaseConnector):
             action_result = self.add_action_result(ActionResult(dict(params)))
             return action_result.set_status(phantom.APP_ERROR, THREATQ_ERROR_CONNECTIVITY_TEST.format(error=error_message))
 
+        # Queue uploads while ThreatQ is unavailable, instead of failing them
+        if config.get("upload_journal", False) and action_id in THREATQ_JOURNAL_ACTIONS:
+            try:
+                self.journal = UploadJournal(make_shared_path(self.get_state_dir(), "journal", tq_host, suffix=".db"))
+            except Exception as e:
+                error_message = self._get_error_message_from_exception(e)
+                self.debug_print(f"Failed to open the upload journal. {error_message}")
+
+        # Match user input against the instance's own object and type names, including custom ones
+        if config.get("sync_catalog", False):
+            catalog = load_catalog(self.tq, make_shared_path(self.get_state_dir(), "catalog", tq_host), max_age=THREATQ_CATALOG_MAX_AGE)
+            self.debug_print(f"Using the {catalog.source} ThreatQ catalog")
+
         # Get the action
         action = self.action_map.get(action_id)
         if not action:
@@ -1742,6 +2008,10 @@ class ThreatQConnector(BaseConnector):
         for action_result in action_results:
             self.add_action_result(action_result)
 
+        # Flush the uploads queued by earlier runs, once this run's results are recorded
+        if self.journal:
+            self._drain_journal()
+
         return self.get_status()
 
 
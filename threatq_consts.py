@@ -31,11 +31,57 @@ THREATQ_TASK_STATUS_MAP = {"To Do": 1, "In Progress": 2, "Review": 3, "Done": 4}
 THREATQ_INVESTIGATION_PRIORITY_MAP = {"Normal": 1, "Escalated": 2}
 THREATQ_INVESTIGATION_VISIBILITY_MAP = {"Private": 0, "Shared": 1}
 
+# Name of the file, within the app state directory, that OAuth tokens are shared through
+THREATQ_TOKEN_STORE_FILE = "threatq_tokens.json"
+
+# Default connection settings, used when the asset doesn't configure them
+THREATQ_DEFAULT_POOL_CONNECTIONS = 10
+THREATQ_DEFAULT_POOL_MAXSIZE = 10
+THREATQ_DEFAULT_CONNECT_TIMEOUT = 30
+THREATQ_DEFAULT_READ_TIMEOUT = 300
+THREATQ_DEFAULT_MAX_RETRIES = 3
+THREATQ_DEFAULT_CIRCUIT_BREAKER_THRESHOLD = 5
+THREATQ_DEFAULT_CIRCUIT_BREAKER_RESET = 60
+THREATQ_DEFAULT_REQUEST_COMPRESSION = "none"
+THREATQ_DEFAULT_RESPONSE_CACHE_TTL = 300
+THREATQ_DEFAULT_UPLOAD_BATCH_SIZE = 1000
+THREATQ_DEFAULT_UPLOAD_BATCH_KB = 4096
+THREATQ_DEFAULT_UPLOAD_CONCURRENCY = 4
+
+THREATQ_REQUEST_COMPRESSION_LIST = ["none", "gzip", "deflate"]
+
+# Seconds before the object and type catalog is fetched from ThreatQ again
+THREATQ_CATALOG_MAX_AGE = 86400
+
+# Maximum number of queued uploads, and seconds spent, flushing the journal at the end of an action run
+THREATQ_JOURNAL_DRAIN_LIMIT = 5000
+THREATQ_JOURNAL_DRAIN_SECONDS = 30
+
+# Actions whose uploads are complete in themselves, which queue them in the journal and flush it.
+# Actions relating uploaded objects or setting their status afterwards need their IDs, so can't be queued
+THREATQ_JOURNAL_ACTIONS = [
+    "create_indicators",
+    "create_event",
+    "create_adversaries",
+    "create_custom_objects",
+    "add_attribute",
+    "add_comment",
+    "add_tag",
+]
+
+# Maximum number of pages of related objects requested at once, within the connection pool size
+THREATQ_RELATED_PAGE_PREFETCH = 4
+
 # Constants relating to 'get_error_message_from_exception'
 ERROR_MESSAGE_UNAVAILABLE = "Error message unavailable. Please check the asset configuration and|or action parameters."
 
 # Constants relating to error messages
 THREATQ_ERROR_CONNECTIVITY_TEST = "Failed to connect to ThreatQ. {error}"
+THREATQ_ERROR_INVALID_INTEGER = "Please provide a valid positive integer value in the '{key}' asset configuration parameter"
+THREATQ_ERROR_INVALID_NON_NEGATIVE_INTEGER = "Please provide a valid non-negative integer value in the '{key}' asset configuration parameter"
+THREATQ_ERROR_INVALID_REQUEST_COMPRESSION = (
+    "Please provide one of the following values in the 'request_compression' asset configuration parameter: {options}"
+)
 THREATQ_ERROR_QUERY_OBJECT_DETAILS = "Error occurred while querying for object details. {error}"
 THREATQ_ERROR_GET_RELATED_OBJECTS = "Error occurred while fetching related objects. {error}"
 THREATQ_ERROR_SET_DATA_RESPONSE = "Error occurred while adding data and summary to the action result. {error}"
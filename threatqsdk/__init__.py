@@ -15,10 +15,11 @@
 # Licensed under Apache 2.0 (https://www.apache.org/licenses/LICENSE-2.0.txt)
 ###########################################################################################################
 
-import json
 import os
 import random
 import re
+import threading
+import time
 from datetime import datetime
 from logging import getLogger
 
@@ -27,24 +28,49 @@ import requests
 # import all of the child modules so consumers can easily access them
 from . import (
     authentication,
+    breaker,
     bulk_object,
+    cache,
+    codec,
+    concurrency,
     event,
     exceptions,
     file,
+    metadata,
+    ratelimit,
+    retry,
+    shared_state,
     source,
+    token_store,
     tqobject,
+    transport,
 )
+from .breaker import CircuitBreaker
 from .bulk_object import ThreatQAttribute, ThreatQObject, ThreatQSource
+from .cache import ResponseCache
+from .concurrency import AsyncThreatq, RequestSpec, iter_prefetched
 from .event import Event
 
 # reexport some commonly used types
 from .file import File
+from .metadata import MetadataRegistry
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+from .token_store import FileTokenStore
 
 
 __all__ = [
     # constants
     "VERSION",
+    "AsyncThreatq",
+    "CircuitBreaker",
     "Event",
+    "FileTokenStore",
+    "MetadataRegistry",
+    "RateLimiter",
+    "RequestSpec",
+    "ResponseCache",
+    "RetryPolicy",
     "ThreatQAttribute",
     "ThreatQObject",
     "ThreatQSource",
@@ -53,12 +79,18 @@ __all__ = [
     # submodules
     "authentication",
     "exceptions",
+    "ratelimit",
+    "retry",
+    "token_store",
 ]
 
 _logger = getLogger(__name__)
 
 VERSION = "1.6.4-pmod"
 
+# Number of objects requested per page by Threatq.iter_pages
+PAGE_SIZE = 500
+
 
 class Threatq:
     """A connection to the ThreatQuotient API.
@@ -79,10 +111,64 @@ class Threatq:
         of the deployment
     :param str proxy: Proxy to use, or None if no proxy should be used.
         In the format ``https://host.name:port``
+    :param token_store: Optional store used to share OAuth tokens between
+        instances, see :py:class:`~threatqsdk.token_store.FileTokenStore`
+    :param int pool_connections: Number of connection pools to cache
+    :param int pool_maxsize: Maximum number of connections kept open to
+        the host, i.e. how many requests can run concurrently without
+        opening extra connections
+    :param timeout: Timeout applied to every request. Either a number of
+        seconds, or a ``(connect, read)`` tuple. None waits forever.
+    :param bool keepalive: If True, enable TCP keep-alive on connections
+    :param retry_policy: Policy for retrying failed requests. Defaults to
+        a :py:class:`~threatqsdk.retry.RetryPolicy` with default settings.
+    :type retry_policy: ~threatqsdk.retry.RetryPolicy
+    :param rate_limiter: Optional limit on the rate and concurrency of
+        requests, applied to every attempt
+    :type rate_limiter: ~threatqsdk.ratelimit.RateLimiter
+    :param circuit_breaker: Optional circuit breaker, failing requests fast
+        while ThreatQ is down
+    :type circuit_breaker: ~threatqsdk.breaker.CircuitBreaker
+    :param str compression: Content encoding to compress JSON request bodies
+        with, ``gzip`` or ``deflate``. None sends them uncompressed. If
+        ThreatQ rejects compressed bodies, they are sent uncompressed from
+        then on. Responses are always compressed when ThreatQ supports it.
+    :param response_cache: Optional cache of ``GET`` responses, revalidated
+        with conditional requests
+    :type response_cache: ~threatqsdk.cache.ResponseCache
+    :param float metadata_ttl: Seconds before vocabularies such as indicator
+        types are downloaded again, see :py:attr:`metadata`
     """
 
-    def __init__(self, threatq_host, auth, private=False, verify=True, proxy=None):
-        self.statusinfo = None
+    def __init__(
+        self,
+        threatq_host,
+        auth,
+        private=False,
+        verify=True,
+        proxy=None,
+        token_store=None,
+        pool_connections=10,
+        pool_maxsize=10,
+        timeout=None,
+        keepalive=False,
+        retry_policy=None,
+        rate_limiter=None,
+        circuit_breaker=None,
+        compression=None,
+        response_cache=None,
+        metadata_ttl=600,
+    ):
+        if compression and compression not in transport.COMPRESSION_ENCODINGS:
+            raise ValueError(f"Unsupported compression: {compression}")
+
+        self.metadata = metadata.MetadataRegistry(self, ttl=metadata_ttl)
+        self.compression = compression
+        self.response_cache = response_cache
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self._local = threading.local()
 
         host_match = re.compile(r"^(\w+://)?([A-Z\d\-\.:]+)", re.IGNORECASE)
         host = host_match.match(threatq_host)
@@ -96,20 +182,177 @@ class Threatq:
         threatq_host = "https://" + host[1]
 
         self.threatq_host = threatq_host
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
         self.session = requests.Session()
+        adapter = transport.ThreatqAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, timeout=timeout, keepalive=keepalive)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         if proxy is not None:
             self.session.proxies = {"https": proxy}
         self.session.verify = verify
 
-        self.auth = authentication.TokenHolder(threatq_host, auth, private, self.session)
+        # Don't wait on the token endpoint while ThreatQ is known to be down
+        self.circuit_breaker.raise_if_open()
+        try:
+            self.auth = authentication.TokenHolder(threatq_host, auth, private, self.session, token_store=token_store)
+        except requests.HTTPError as e:
+            self.circuit_breaker.record_response(response=e.response)
+            raise
+        except requests.RequestException as e:
+            self.circuit_breaker.record_response(error=e)
+            raise
 
     def now(self):
         """Get the current time in the string format that the TQ API expects"""
         return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+    @property
+    def last_attempts(self):
+        """Number of attempts the last request made by this thread took"""
+        return getattr(self._local, "attempts", 0)
+
+    def _request(self, method, endpoint, headers=None, deadline=None, **kwargs):
+        """Make an authenticated request.
+
+        The request is re-authenticated and retried once if the API rejects
+        our access token. Requests that are safe to repeat are also retried
+        according to the ``retry_policy`` on connection errors and retryable
+        status codes. The number of attempts made is set as the ``attempts``
+        property of the response, and as :py:attr:`last_attempts`.
+
+        Text bodies are compressed when ``compression`` is set. If the API
+        answers ``415 Unsupported Media Type``, compression is turned off and
+        the request is sent again uncompressed.
+
+        :param str method: HTTP method
+        :param str endpoint: The endpoint to hit
+        :param dict headers: Extra request headers
+        :param float deadline: ``time.monotonic()`` value by which the
+            request, including its retries, must be done. Each attempt's
+            timeout is cut to the time left, and no attempt is made past it.
+        :param kwargs: Passed through to :py:meth:`requests.Session.request`
+
+        :raises:
+            :py:class:`~requests.exceptions.HTTPError` if the API \
+                returns a status code outside of the range [200, 299]
+            :py:class:`~requests.exceptions.Timeout` if the deadline passes
+
+        :returns: The :py:class:`~requests.Response`
+        """
+        token = self.auth.accesstoken
+        if self.auth.is_token_expired():
+            self.auth.refresh(stale_token=token)
+
+        if endpoint[0] != "/":
+            endpoint = "/" + endpoint
+
+        body = kwargs.get("data")
+        compressed = self.compression and isinstance(body, (str, bytes)) and len(body) >= transport.COMPRESSION_MIN_SIZE
+        if compressed:
+            kwargs["data"] = transport.compress_body(body, self.compression)
+            headers = {**(headers or {}), "Content-Encoding": self.compression}
+
+        def send(token):
+            if deadline is not None:
+                kwargs["timeout"] = self._timeout_within(deadline)
+            self.circuit_breaker.before_request()
+            auth_headers = {"Authorization": f"Bearer {token}", **(headers or {})}
+            try:
+                with self.rate_limiter.limit():
+                    r = self.session.request(method, self.threatq_host + endpoint, headers=auth_headers, **kwargs)
+            except Exception as e:
+                self.circuit_breaker.record_response(error=e)
+                raise
+
+            self.circuit_breaker.record_response(response=r)
+            return r
+
+        repeatable = self.retry_policy.is_repeatable(method, endpoint)
+        reauthenticated = False
+        attempt = 0
+        while True:
+            attempt += 1
+            self._local.attempts = attempt
+            token = self.auth.accesstoken
+            try:
+                r = send(token)
+            except Exception as e:
+                if not repeatable or not self.retry_policy.should_retry(attempt, error=e):
+                    raise
+
+                delay = self.retry_policy.get_delay(attempt)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise
+                _logger.debug(f"{method} {endpoint} failed ({e}), attempt {attempt}. Retrying in {delay:.1f}s")
+                time.sleep(delay)
+                self._rewind(kwargs.get("files"))
+                continue
+
+            if r.status_code == 401 and not reauthenticated:
+                # The token was revoked or expired early; get a new one and try again
+                _logger.debug(f"Access token rejected for {method} {endpoint}. Re-authenticating")
+                self.auth.refresh(stale_token=token)
+                self._rewind(kwargs.get("files"))
+                reauthenticated = True
+                continue
+
+            if r.status_code == 415 and compressed:
+                _logger.debug(f"ThreatQ rejected a {self.compression} compressed body for {method} {endpoint}. Disabling compression")
+                self.compression = None
+                kwargs["data"] = body
+                headers = {key: value for key, value in headers.items() if key != "Content-Encoding"}
+                compressed = False
+                continue
+
+            if repeatable and self.retry_policy.should_retry(attempt, response=r):
+                delay = self.retry_policy.get_delay(attempt, response=r)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    break
+                _logger.debug(f"{method} {endpoint} returned {r.status_code}, attempt {attempt}. Retrying in {delay:.1f}s")
+                time.sleep(delay)
+                self._rewind(kwargs.get("files"))
+                continue
+
+            break
+
+        r.attempts = attempt
+        r.raise_for_status()
+        return r
+
+    def _timeout_within(self, deadline):
+        """Cut the configured timeout to the time left before a deadline
+
+        :param float deadline: ``time.monotonic()`` value
+
+        :raises: :py:class:`~requests.exceptions.Timeout` if the deadline has passed
+
+        :returns: Timeout for the next attempt, in the format of ``timeout``
+        """
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise requests.exceptions.Timeout("The request ran out of time")
+
+        if isinstance(self.timeout, tuple):
+            return tuple(remaining if value is None else min(value, remaining) for value in self.timeout)
+
+        return remaining if self.timeout is None else min(self.timeout, remaining)
+
+    @staticmethod
+    def _rewind(files):
+        """Seek any file objects back to the start, so a request can be re-sent"""
+        for f in (files or {}).values():
+            content = f[1] if isinstance(f, tuple) else f
+            if hasattr(content, "seek"):
+                content.seek(0)
+
     def get(self, endpoint, withp=None, params=None):
         """ Make an authenticated ``GET`` request
 
+        With a ``response_cache`` caching the endpoint, a cached response is
+        revalidated with a conditional request, and reused if the API answers
+        ``304 Not Modified``.
+
         :param str endpoint: The endpoint to make a get request of.
         :param str withp: ``withp`` properties.
         :param dict params: Dictionary of URL parameters.
@@ -123,32 +366,143 @@ class Threatq:
 
         :returns: JSON-decoded API response
         """
-        if self.auth.is_token_expired():
-            self.auth.refresh()
-
         if withp:
             if params is None:
                 params = {}
             params["with"] = withp
 
-        if endpoint[0] != "/":
-            endpoint = "/" + endpoint
+        if self.response_cache is None or not self.response_cache.caches(endpoint):
+            r = self._request("GET", endpoint, params=params)
+            res = codec.loads(r.content)
+            if "errors" in res:
+                raise exceptions.APIError(r)
 
-        r = self.session.get(self.threatq_host + endpoint, headers={"Authorization": f"Bearer {self.auth.accesstoken}"}, params=params)
-        r.raise_for_status()
+            return res
 
-        res = r.json()
+        key = self.response_cache.make_key(endpoint, params, user=self.auth.identity)
+        entry = self.response_cache.get(key)
+        r = self._request("GET", endpoint, headers=self.response_cache.conditional_headers(entry), params=params)
+        if r.status_code == 304 and entry is not None:
+            self.response_cache.refresh(key, entry)
+            return codec.loads(entry["body"])
+
+        res = codec.loads(r.content)
         if "errors" in res:
             raise exceptions.APIError(r)
 
+        self.response_cache.store(key, r)
         return res
 
+    def iter_pages(self, endpoint, params=None, page_size=PAGE_SIZE, withp=None, prefetch=0):
+        """Iterate over all the objects of a list endpoint, one page at a time
+
+        Pages are requested with ``limit`` and ``offset``, the offset
+        advancing by the number of objects returned, as the server may return
+        fewer than ``limit``. Pages are requested until the ``total`` reported
+        by the API is reached or a page is empty, or, without a ``total``,
+        until a page is not full. Paging stops early if a page repeats the
+        previous one, or holds more objects than ``limit``, as the endpoint
+        then ignores them. If a response includes a ``cursor``, the
+        following pages are requested with that cursor instead. Only one page
+        is held in memory at a time.
+
+        With ``prefetch``, once the first page gives the ``total`` and the
+        number of objects per page, the remaining pages are requested
+        concurrently, up to ``prefetch`` pages ahead of the consumer. Objects
+        are still yielded in order, and at most ``prefetch`` pages are held in
+        memory. Cursor pagination is always sequential.
+
+        :param str endpoint: The endpoint to list
+        :param dict params: Dictionary of URL parameters. A ``limit`` is used
+            as the page size.
+        :param int page_size: Number of objects to request per page
+        :param str withp: ``withp`` properties
+        :param int prefetch: Maximum number of pages in flight. 0 fetches
+            pages one after the other.
+
+        :raises:
+            :py:class:`~threatqsdk.exceptions.APIError` if the API \
+                response does not contains an ``errors`` property
+            :py:class:`~requests.exceptions.HTTPError` if the API \
+                returns a status code outside of the range [200, 299]
+
+        :returns: Generator of JSON-decoded objects
+        """
+        params = dict(params or {})
+        if withp:
+            params["with"] = withp
+        page_size = int(params.get("limit") or page_size)
+        params["limit"] = page_size
+        offset = params.pop("offset", 0)
+
+        cursor = None
+        previous = None
+        while True:
+            if cursor is None:
+                params["offset"] = offset
+            else:
+                params.pop("offset", None)
+                params["cursor"] = cursor
+
+            res = self.get(endpoint, params=dict(params))
+            data = res.get("data", [])
+            if isinstance(data, dict):
+                # Not a list endpoint
+                yield data
+                return
+
+            # An endpoint ignoring the offset (or cursor) returns the same page again
+            page = (data[0], data[-1]) if data else None
+            if page is not None and page == previous:
+                return
+            previous = page
+
+            yield from data
+
+            next_cursor = res.get("cursor")
+            if next_cursor:
+                if not data or next_cursor == cursor:
+                    return
+                cursor = next_cursor
+                continue
+
+            # The server may return fewer objects than the limit, so follow the objects actually returned
+            offset += len(data)
+            total = res.get("total")
+            if total is None:
+                # Without a total, a page which isn't full is the last one, and a larger one isn't paged at all
+                if len(data) != page_size:
+                    return
+                continue
+
+            total = int(total)
+            if not data or offset >= total:
+                return
+
+            if prefetch:
+                step = len(data)
+                pages = iter_prefetched(
+                    lambda page_offset: (page_offset, self.get(endpoint, params=dict(params, offset=page_offset))),
+                    range(offset, total, step),
+                    prefetch,
+                )
+                for page_offset, page in pages:
+                    data = page.get("data", [])
+                    yield from data
+                    offset = page_offset + len(data)
+                    if len(data) < min(step, total - page_offset):
+                        # The next pages don't start where this one ended, fetch the rest one page at a time
+                        pages.close()
+                        break
+                else:
+                    return
+
     def put(self, endpoint, data=None, params=None):
         """ Make an authenticated ``PUT`` request.
 
         :param str endpoint: The endpoint to hit
         :param dict data: Dictionary of data.
-            Will be automatically serialized with `json.dumps`
+            Will be automatically serialized with :py:func:`~threatqsdk.codec.dumps`
         :param dict params: Dictionary of URL parameters.
             Parameter names and values will be encoded for you.
 
@@ -160,21 +514,9 @@ class Threatq:
 
         :returns: JSON-decoded API response
         """
-        if self.auth.is_token_expired():
-            self.auth.refresh()
-
-        if endpoint[0] != "/":
-            endpoint = "/" + endpoint
-
-        r = self.session.put(
-            self.threatq_host + endpoint,
-            headers={"Authorization": f"Bearer {self.auth.accesstoken}", "content-type": "application/json"},
-            data=json.dumps(data),
-            params=params,
-        )
-        r.raise_for_status()
+        r = self._request("PUT", endpoint, headers={"content-type": "application/json"}, data=codec.dumps(data), params=params)
 
-        res = r.json()
+        res = codec.loads(r.content)
         if "errors" in res:
             raise exceptions.APIError(r)
 
@@ -194,65 +536,37 @@ class Threatq:
         :returns: JSON-decoded API response
         """
 
-        if self.auth.is_token_expired():
-            self.auth.refresh()
-
-        if endpoint[0] != "/":
-            endpoint = "/" + endpoint
-
-        r = self.session.delete(
-            self.threatq_host + endpoint,
-            headers={
-                "Authorization": f"Bearer {self.auth.accesstoken}",
-            },
-        )
-
-        r.raise_for_status()
+        self._request("DELETE", endpoint)
         return
 
-    def post(self, endpoint, data=None, files=None, params=None):
+    def post(self, endpoint, data=None, files=None, params=None, body=None, deadline=None):
         """ Make an authenticated ``POST`` request.
 
         :param str endpoint: The endpoint to hit
         :param dict data: POST data
         :param dict params: Dictionary of URL parameters.
             Parameter names and values will be encoded for you.
+        :param bytes body: JSON body, already serialized, sent instead of ``data``
+        :param float deadline: ``time.monotonic()`` value by which the
+            request, including its retries, must be done
 
         :raises:
             :py:class:`~threatqsdk.exceptions.APIError` if the API \
                 response does not contains an ``errors`` property
             :py:class:`~requests.exceptions.HTTPError` if the API \
                 returns a status code outside of the range [200, 299]
+            :py:class:`~requests.exceptions.Timeout` if the deadline passes
 
         :returns: JSON-decoded API response
         """
 
-        if self.auth.is_token_expired():
-            self.auth.refresh()
-
-        if endpoint[0] != "/":
-            endpoint = "/" + endpoint
-
         if files:
-            r = self.session.post(
-                self.threatq_host + endpoint,
-                headers={
-                    "Authorization": f"Bearer {self.auth.accesstoken}",
-                },
-                data=data,
-                files=files,
-                params=params,
-            )
+            r = self._request("POST", endpoint, data=data, files=files, params=params, deadline=deadline)
         else:
-            r = self.session.post(
-                self.threatq_host + endpoint,
-                headers={"Authorization": f"Bearer {self.auth.accesstoken}", "content-type": "application/json"},
-                data=json.dumps(data),
-                params=params,
-            )
-        r.raise_for_status()
+            body = codec.dumps(data) if body is None else body
+            r = self._request("POST", endpoint, headers={"content-type": "application/json"}, data=body, params=params, deadline=deadline)
 
-        res = r.json()
+        res = codec.loads(r.content)
         if "errors" in res:
             raise exceptions.APIError(r)
 
@@ -302,16 +616,7 @@ class Threatq:
 
         :returns: String type name, or None if the ID isn't found
         """
-        typeinfo = self.get("/api/indicator/types")
-        if not typeinfo:
-            _logger.debug("Failed to get indicator types")
-            return None
-
-        for t in typeinfo["data"]:
-            if t["id"] == typeid:
-                return t["name"]
-
-        return None
+        return self.metadata.name_of("indicator_types", typeid)
 
     def get_users(self, withp=""):
         """Gets all users"""
@@ -320,7 +625,7 @@ class Threatq:
         if withp:
             params["with"] = withp
 
-        return self.get("/api/users", params=params).get("data", [])
+        return list(self.iter_pages("/api/users", params=params))
 
     def get_indicator_type_by_name(self, type_name):
         """Convert an indicator type name to ID
@@ -343,16 +648,7 @@ class Threatq:
 
         :returns: String status name, or None if the ID isn't found
         """
-        statusinfo = self.get("/api/indicator/statuses")
-        if not statusinfo:
-            _logger.debug("Failed to get indicator statuses")
-            return None
-
-        for s in statusinfo["data"]:
-            if s["id"] == statusid:
-                return s["name"]
-
-        return None
+        return self.metadata.name_of("indicator_statuses", statusid)
 
     def getstatusidbyname(self, statusname):
         """Convert an indicator name to its numerical ID
@@ -361,17 +657,7 @@ class Threatq:
 
         :returns: Integer status ID, or None if the name isn't found
         """
-        if not self.statusinfo:
-            self.statusinfo = self.get("/api/indicator/statuses")
-            if not self.statusinfo:
-                _logger.debug("Failed to get indicator statuses")
-                return None
-
-        for s in self.statusinfo["data"]:
-            if s["name"] == statusname:
-                return s["id"]
-
-        return None
+        return self.metadata.id_of("indicator_statuses", statusname)
 
     def geteventtypename(self, typeid):
         """Convert an event type ID to a human-readable name
@@ -380,16 +666,7 @@ class Threatq:
 
         :returns: String, or None if the ID isn't found
         """
-        typeinfo = self.get("/api/event/types")
-        if not typeinfo:
-            _logger.debug("Failed to get event types")
-            return None
-
-        for t in typeinfo["data"]:
-            if t["id"] == typeid:
-                return t["name"]
-
-        return None
+        return self.metadata.name_of("event_types", typeid)
 
     def bulkuploadindicators(self, indicators, custom_source=None):
         inds = []
@@ -414,16 +691,7 @@ class Threatq:
 
         :returns: Integer ID, or None if the name isn't found
         """
-        typeinfo = self.get("/api/event/types")
-        if not typeinfo:
-            _logger.debug("Failed to get event types")
-            return None
-
-        for t in typeinfo["data"]:
-            if t["name"] == name:
-                return t["id"]
-
-        return None
+        return self.metadata.id_of("event_types", name)
 
     def getparseridbyname(self, name):
         """Convert a human-readable event type name to its numerical ID
@@ -432,16 +700,7 @@ class Threatq:
 
         :returns: Integer ID, or None if the name isn't found
         """
-        typeinfo = self.get("/api/attachments/types?is_parsable=Y")
-        if not typeinfo:
-            _logger.debug("Failed to get parser types")
-            return None
-
-        for t in typeinfo["data"]:
-            if t["name"] == name:
-                return t["id"]
-
-        return None
+        return self.metadata.id_of("parsers", name)
 
     def getsigparseridbyname(self, name):
         """Convert a human-readable event type name to its numerical ID
@@ -450,16 +709,7 @@ class Threatq:
 
         :returns: Integer ID, or None if the name isn't found
         """
-        typeinfo = self.get("/api/signature/types")
-        if not typeinfo:
-            _logger.debug("Failed to get parser types")
-            return None
-
-        for t in typeinfo["data"]:
-            if t["name"] == name:
-                return t["id"]
-
-        return None
+        return self.metadata.id_of("signature_types", name)
 
     def import_text2(self, text, custom_source, parser="Generic Text"):
         """ Submit some text to be imported
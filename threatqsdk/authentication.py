@@ -16,6 +16,8 @@
 ###########################################################################################################
 
 import json
+import random
+import threading
 from datetime import datetime
 from logging import getLogger
 
@@ -24,6 +26,14 @@ from . import exceptions
 
 _logger = getLogger(__name__)
 
+# Access token lifetime, when the token response doesn't include ``expires_in``
+TOKEN_LIFETIME = 60 * 30
+
+# Refresh tokens this many seconds before they expire, plus a random jitter of
+# up to REFRESH_JITTER seconds so concurrent workers don't refresh all at once
+REFRESH_WINDOW = 120
+REFRESH_JITTER = 60
+
 
 class TokenHolder:
     """Create a token holder, authenticating with the API in thep rocess
@@ -45,29 +55,65 @@ class TokenHolder:
         used.
     :param session: The ``requests`` session to use
     :type session:`~requests.Session`
+    :param token_store: Optional store to share tokens between instances.
+        A valid stored token is reused, a token close to expiring is
+        refreshed, and a new token is only requested when both fail. If the
+        store can't be locked, e.g. because its directory isn't writable,
+        tokens are requested as if there was no store.
+    :type token_store: ~threatqsdk.token_store.FileTokenStore
 
     :raises: :py:class:`~threatqsdk.exceptions.AuthenticationError` if
         authentication fails
     """
 
-    def __init__(self, host, auth, private, session):
+    def __init__(self, host, auth, private, session, token_store=None):
+        self.threatq_clientid = None
         if not private:
-            threatq_clientid = auth["clientid"]
+            self.threatq_clientid = auth["clientid"]
             auth = auth["auth"]
 
         self.threatq_host = host
         self.auth = auth
         self.private = private
         self.session = session
+        self.token_store = token_store
+        self._lock = threading.Lock()
 
-        if not private:
+        self.accesstoken = None
+        self.refreshtoken = None
+        self.token_time = None
+        self.expires_in = TOKEN_LIFETIME
+        self.refresh_after = TOKEN_LIFETIME
+
+        if self.token_store is None:
+            self._authenticate()
+        else:
+            self._load_or_authenticate()
+
+    @property
+    def identity(self):
+        """The client ID and user tokens are issued to, as a string"""
+        if self.private:
+            return str(self.auth[0])
+
+        return f"{self.threatq_clientid}|{self.auth.get('email') or ''}"
+
+    def _store_key(self):
+        if self.private:
+            return self.token_store.make_key(self.threatq_host, self.auth[0], None)
+
+        return self.token_store.make_key(self.threatq_host, self.threatq_clientid, self.auth.get("email"))
+
+    def _authenticate(self):
+        """Request a new access token using the configured credentials"""
+        if not self.private:
             r = self.session.post(
                 self.threatq_host + "/api/token",
                 params={
                     "grant_type": "password",
-                    "client_id": threatq_clientid,
+                    "client_id": self.threatq_clientid,
                 },
-                data=json.dumps(auth),
+                data=json.dumps(self.auth),
                 headers={"content-type": "application/json"},
             )
         else:
@@ -76,9 +122,9 @@ class TokenHolder:
                 params={
                     "grant_type": "client_credentials",
                 },
-                data=json.dumps(auth),
+                data=json.dumps(self.auth),
                 headers={"content-type": "application/json"},
-                auth=(auth[0], auth[1]),
+                auth=(self.auth[0], self.auth[1]),
             )
 
         if r.status_code == 400:
@@ -91,24 +137,10 @@ class TokenHolder:
         if "access_token" not in res:
             raise exceptions.AuthenticationError(res)
 
-        self.accesstoken = res["access_token"]
-        self.refreshtoken = res["refresh_token"]
-
-        self.token_time = datetime.now()
-
-    def is_token_expired(self):
-        """Determine if the access token has expired based on the
-        current time.
-
-        Tokens expire every 30 minutes
-        """
-        now = datetime.now()
-        dt = now - self.token_time
-        return dt.total_seconds() > (60 * 30)
+        self._set_tokens(res)
 
-    def refresh(self):
-        """Referesh the access token"""
-        _logger.debug("Refreshing acces token")
+    def _refresh_grant(self):
+        """Exchange the refresh token for a new access token"""
         params = {"grant_type": "refresh_token", "refresh_token": self.refreshtoken}
         if not self.private:
             r = self.session.post(
@@ -127,7 +159,133 @@ class TokenHolder:
         r.raise_for_status()
 
         res = r.json()
+        if "access_token" not in res:
+            raise exceptions.AuthenticationError(res)
+
+        self._set_tokens(res)
 
+    def _set_tokens(self, res):
         self.accesstoken = res["access_token"]
-        self.refreshtoken = res["refresh_token"]
+        self.refreshtoken = res.get("refresh_token")
         self.token_time = datetime.now()
+        self._set_lifetime(res.get("expires_in"))
+
+    def _set_lifetime(self, expires_in):
+        """Set the token lifetime, and pick when to proactively refresh within it
+
+        :param int expires_in: Lifetime in seconds, as given by the token response
+        """
+        try:
+            self.expires_in = float(expires_in) if expires_in else TOKEN_LIFETIME
+        except (TypeError, ValueError):
+            self.expires_in = TOKEN_LIFETIME
+
+        # Never spend more than half of a (short) lifetime in the refresh window
+        window = min(REFRESH_WINDOW + random.uniform(0, REFRESH_JITTER), self.expires_in / 2)
+        self.refresh_after = self.expires_in - window
+
+    def _to_entry(self):
+        return {
+            "access_token": self.accesstoken,
+            "refresh_token": self.refreshtoken,
+            "token_time": self.token_time.timestamp(),
+            "expires_in": self.expires_in,
+        }
+
+    def _from_entry(self, entry):
+        try:
+            self.accesstoken = entry["access_token"]
+            self.refreshtoken = entry.get("refresh_token")
+            self.token_time = datetime.fromtimestamp(float(entry["token_time"]))
+        except (KeyError, TypeError, ValueError):
+            return False
+
+        self._set_lifetime(entry.get("expires_in"))
+        return True
+
+    def _renew(self):
+        """Refresh the held token if possible, falling back to a new password grant"""
+        if self.refreshtoken:
+            try:
+                self._refresh_grant()
+                return
+            except Exception as e:
+                _logger.debug(f"Failed to refresh access token, re-authenticating: {e}")
+
+        self._authenticate()
+
+    def _load_or_authenticate(self):
+        """Take a token from the store, renewing it under the store's lock when needed"""
+        key = self._store_key()
+        entry = self.token_store.load(key)
+        if entry and self._from_entry(entry) and not self.is_token_expired():
+            _logger.debug("Using stored access token")
+            return
+
+        with self.token_store.lock() as locked:
+            if not locked:
+                # Authenticate as if there was no store, rather than fail
+                self._authenticate()
+                return
+
+            # Another run may have renewed the token while we waited on the lock
+            entry = self.token_store.load(key)
+            if entry and self._from_entry(entry) and not self.is_token_expired():
+                _logger.debug("Using stored access token")
+                return
+
+            if entry:
+                self._renew()
+            else:
+                self._authenticate()
+
+            self.token_store.save(key, self._to_entry())
+
+    def is_token_expired(self):
+        """Determine if the access token has expired, or is about to,
+        based on the current time.
+
+        Tokens expire after the ``expires_in`` seconds given by the token
+        response (30 minutes if it's missing). They are reported as expired
+        slightly early, within a jittered refresh window, so they are renewed
+        before any request can be rejected.
+        """
+        if self.token_time is None:
+            return True
+
+        now = datetime.now()
+        dt = now - self.token_time
+        return dt.total_seconds() > self.refresh_after
+
+    def refresh(self, stale_token=None):
+        """Referesh the access token
+
+        Safe to call from several threads at once.
+
+        :param str stale_token: The access token the caller found expired or
+            rejected. If another thread has replaced it in the meantime, the
+            new token is kept instead of refreshing again.
+        """
+        with self._lock:
+            if stale_token is not None and stale_token != self.accesstoken:
+                return
+
+            _logger.debug("Refreshing acces token")
+            if self.token_store is None:
+                self._renew()
+                return
+
+            key = self._store_key()
+            held_token = self.accesstoken
+            with self.token_store.lock() as locked:
+                if not locked:
+                    self._renew()
+                    return
+
+                # Adopt a token another run has already renewed
+                entry = self.token_store.load(key)
+                if entry and entry.get("access_token") != held_token and self._from_entry(entry) and not self.is_token_expired():
+                    return
+
+                self._renew()
+                self.token_store.save(key, self._to_entry())
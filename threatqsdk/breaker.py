@@ -0,0 +1,157 @@
+###########################################################################################################
+# File: breaker.py
+#
+# ThreatQuotient Proprietary and Confidential
+# Copyright (c) 2016-2026 ThreatQuotient, Inc. All rights reserved.
+#
+# NOTICE: All information contained herein, is, and remains the property of ThreatQuotient, Inc.
+# The intellectual and technical concepts contained herein are proprietary to ThreatQuotient, Inc.
+# and its suppliers and may be covered by U.S. and Foreign Patents, patents in process, and are
+# protected by trade secret or copyright law.
+#
+# Dissemination of this information or reproduction of this material is strictly forbidden unless prior
+# written permission is obtained from ThreatQuotient, Inc.
+#
+# Licensed under Apache 2.0 (https://www.apache.org/licenses/LICENSE-2.0.txt)
+###########################################################################################################
+
+import threading
+import time
+from contextlib import contextmanager
+from logging import getLogger
+
+from . import exceptions
+from .shared_state import locked_json
+
+
+_logger = getLogger(__name__)
+
+# Status codes meaning the backend itself is failing
+FAILURE_STATUSES = (500, 502, 503, 504)
+
+
+class CircuitBreaker:
+    """Fail fast while the ThreatQ backend is down
+
+    The circuit opens after ``failure_threshold`` consecutive failed
+    requests. While it is open, requests raise
+    :py:class:`~threatqsdk.exceptions.CircuitOpenError` without touching the
+    network. Once ``reset_timeout`` seconds have passed, a single probe
+    request is let through (the circuit is "half-open"): if it succeeds the
+    circuit closes, otherwise it opens again for another ``reset_timeout``.
+
+    When ``shared_path`` is given, the circuit state is kept in that file, so
+    every process on the host sees the same circuit and an outage only has
+    to be detected once.
+
+    :param int failure_threshold: Consecutive failures opening the circuit.
+        None or 0 disables the breaker.
+    :param float reset_timeout: Seconds to wait before probing an open circuit
+    :param str shared_path: Optional file to share the circuit state through
+    """
+
+    def __init__(self, failure_threshold=None, reset_timeout=60, shared_path=None):
+        self.failure_threshold = failure_threshold or 0
+        self.reset_timeout = reset_timeout
+        self.shared_path = shared_path
+
+        self._lock = threading.Lock()
+        self._local_state = {}
+
+    @contextmanager
+    def _state(self):
+        """Hold the circuit state for the duration of the block"""
+        if self.shared_path:
+            entered = False
+            try:
+                with locked_json(self.shared_path) as state:
+                    entered = True
+                    yield state
+                return
+            except OSError as e:
+                # Never fail requests because the shared state is unavailable
+                _logger.debug(f"Failed to use shared circuit state {self.shared_path}: {e}")
+                if entered:
+                    return
+
+        with self._lock:
+            yield self._local_state
+
+    def raise_if_open(self):
+        """Check that the circuit isn't open, without claiming the probe of a
+        half-open circuit
+
+        :raises: :py:class:`~threatqsdk.exceptions.CircuitOpenError` if the
+            circuit is open
+        """
+        if not self.failure_threshold:
+            return
+
+        with self._state() as state:
+            opened_at = state.get("opened_at")
+            now = time.time()
+            if opened_at is not None and now - opened_at < self.reset_timeout:
+                raise exceptions.CircuitOpenError(opened_at + self.reset_timeout - now)
+
+    def before_request(self):
+        """Check that a request may be made
+
+        :raises: :py:class:`~threatqsdk.exceptions.CircuitOpenError` if the
+            circuit is open
+        """
+        if not self.failure_threshold:
+            return
+
+        with self._state() as state:
+            opened_at = state.get("opened_at")
+            if opened_at is None:
+                return
+
+            now = time.time()
+            if now - opened_at < self.reset_timeout:
+                raise exceptions.CircuitOpenError(opened_at + self.reset_timeout - now)
+
+            # Let a single probe through; a probe that never reported back is replaced
+            probe_at = state.get("probe_at")
+            if probe_at is not None and now - probe_at < self.reset_timeout:
+                raise exceptions.CircuitOpenError(probe_at + self.reset_timeout - now)
+
+            _logger.debug("Circuit half-open, probing ThreatQ")
+            state["probe_at"] = now
+
+    def record_success(self):
+        """Record a successful request, closing the circuit"""
+        if not self.failure_threshold:
+            return
+
+        with self._state() as state:
+            if state.get("opened_at") is not None:
+                _logger.debug("ThreatQ recovered, closing circuit")
+            state.clear()
+
+    def record_failure(self):
+        """Record a failed request, opening the circuit if there were too many"""
+        if not self.failure_threshold:
+            return
+
+        with self._state() as state:
+            failures = state.get("failures", 0) + 1
+            state["failures"] = failures
+            if state.get("probe_at") is not None or (state.get("opened_at") is None and failures >= self.failure_threshold):
+                _logger.debug(f"Opening circuit after {failures} consecutive failures")
+                state["opened_at"] = time.time()
+                state["probe_at"] = None
+
+    def record_response(self, response=None, error=None):
+        """Record the outcome of a request
+
+        Connection errors, timeouts and 5XX responses count as failures.
+
+        :param response: The response received, if any
+        :type response: ~requests.Response
+        :param Exception error: The error raised, if any
+        """
+        if error is not None or (response is not None and response.status_code in FAILURE_STATUSES):
+            self.record_failure()
+        else:
+            self.record_success()
@@ -17,11 +17,25 @@
 
 import logging
 import math
-from random import randint
-from time import sleep
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 from six import string_types
 
+from . import codec
+from .upload import (
+    MAX_BATCH_BYTES,
+    MAX_BATCH_OBJECTS,
+    BatchSizer,
+    PacingController,
+    ReconciliationIndex,
+    UploadReport,
+    encode_batch,
+    is_splittable,
+    object_key,
+)
+
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -30,12 +44,85 @@ VERSION = "1.1.1"
 
 tlp_map = {"red": 1, "amber": 2, "green": 3, "white": 4}
 
+# Fields of an object set from the last duplicate setting them, see ThreatQObject.merge_objects
+MERGED_FIELDS = (
+    "oid",
+    "value",
+    "name",
+    "title",
+    "description",
+    "published_at",
+    "happened_at",
+    "tlp",
+    "status_id",
+    "status",
+    "type_id",
+    "type",
+    "score",
+)
+
+
+class LazyContainer:
+    """
+    A list or dict attribute which is only allocated when it is first used
+
+    The value is kept in a slot of the same name with a leading underscore,
+    None until the attribute is read or set. Code which only needs to know
+    whether the container has items can check the slot, to avoid allocating
+    empty containers for every object.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.slot = None
+
+    def __set_name__(self, owner, name):
+        self.slot = owner.__dict__["_" + name]
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+
+        value = self.slot.__get__(obj, objtype)
+        if value is None:
+            value = self.factory()
+            self.slot.__set__(obj, value)
+
+        return value
+
+    def __set__(self, obj, value):
+        self.slot.__set__(obj, value)
+
 
 class ThreatQObject:
     """
     Object to encapsulate all object types in ThreatQ
     """
 
+    __slots__ = (
+        "_attributes",
+        "_comments",
+        "_metadata",
+        "_relationships",
+        "_sources",
+        "_tags",
+        "api_name",
+        "description",
+        "happened_at",
+        "name",
+        "oid",
+        "published_at",
+        "score",
+        "status",
+        "status_id",
+        "title",
+        "tlp",
+        "tq",
+        "type",
+        "type_id",
+        "value",
+    )
+
     # Not including Files/Attachments because we can't bulk upload
     object_list = [
         "indicators",
@@ -56,6 +143,13 @@ class ThreatQObject:
         "stix_pattern",
     ]
 
+    attributes = LazyContainer(list)
+    comments = LazyContainer(list)
+    sources = LazyContainer(list)
+    tags = LazyContainer(list)
+    relationships = LazyContainer(dict)
+    metadata = LazyContainer(dict)
+
     def __init__(self, tq, api_name):
         self.tq = tq
         self.api_name = api_name
@@ -66,22 +160,64 @@ class ThreatQObject:
         self.name = ""
         self.title = ""
         self.description = ""
-        self.attributes = []
+        self._attributes = None
         self.published_at = None
         self.happened_at = None
-        self.comments = []
+        self._comments = None
         self.tlp = None
         self.status_id = None
         self.status = None
         self.type_id = None
         self.type = None
         self.score = None
-        self.sources = []
-        self.tags = []
+        self._sources = None
+        self._tags = None
 
         # Related objects
-        self.relationships = {}
-        self.metadata = {}
+        self._relationships = None
+        self._metadata = None
+
+    @staticmethod
+    def merge_objects(objects):
+        """
+        Merge objects describing the same ThreatQ object into a new one
+
+        Fields are taken from the last object setting them, as if the objects
+        were uploaded one after the other. Sources, attributes, comments,
+        tags and relationships are combined. The objects themselves are left
+        unchanged.
+        """
+
+        merged = ThreatQObject(objects[0].tq, objects[0].api_name)
+        related_keys = {}
+        for obj in objects:
+            for field in MERGED_FIELDS:
+                value = getattr(obj, field)
+                if value is not None and value != "":
+                    setattr(merged, field, value)
+
+            merged.sources.extend(obj._sources or [])
+            merged.attributes.extend(
+                ThreatQAttribute(attr.name, attr.value, sources=list(attr._sources or []), tlp=attr.tlp)
+                if isinstance(attr, ThreatQAttribute)
+                else attr
+                for attr in obj._attributes or []
+            )
+            merged.comments.extend(comment for comment in obj._comments or [] if comment not in merged.comments)
+            merged.add_tags(obj._tags or [])
+            for rel_name, items in (obj._relationships or {}).items():
+                related = merged.relationships.setdefault(rel_name, [])
+                keys = related_keys.setdefault(rel_name, set())
+                for item in items:
+                    # Relate each object once, by ID when it has one
+                    item_id = item.oid if isinstance(item, ThreatQObject) else item.get("id") if isinstance(item, dict) else None
+                    key = ("id", item_id) if item_id is not None else ("object", id(item))
+                    if key not in keys:
+                        keys.add(key)
+                        related.append(item)
+            merged.metadata.update(obj._metadata or {})
+
+        return merged
 
     def _get_base_endpoint_name(self):
         return self.api_name
@@ -322,53 +458,120 @@ class ThreatQObject:
             self.add_attribute(item["name"], item["value"], sources=attr_sources, tlp=item.get("tlp"))
 
         # Load comments
-        self.comments = api_response.get("comments", []) or []
+        self.comments = api_response.get("comments") or None
 
         return self
 
     @staticmethod
-    def bulk_upload(tq, objects, show_debug=True, ignored_fields=[]):
+    def bulk_upload(
+        tq,
+        objects,
+        show_debug=True,
+        ignored_fields=[],
+        pacing=None,
+        max_batch_objects=MAX_BATCH_OBJECTS,
+        max_batch_bytes=MAX_BATCH_BYTES,
+        concurrency=1,
+        report=None,
+    ):
         """
         Bulk upload a list of ThreatObjects
-        """
 
+        Batches are serialized while earlier ones are in flight, and up to
+        ``concurrency`` of them are uploaded at once.
+
+        Objects with the same value (or name, or title) and type are merged
+        and uploaded once. All of them are given the ID of the uploaded object.
+
+        A batch rejected by ThreatQ as invalid (400, 413 or 422) is split in
+        half and both halves are uploaded again, until the objects causing
+        the failure are isolated, down to single objects, so that invalid
+        objects don't prevent the rest of their batch from being uploaded.
+        Batches failing for any
+        other reason, such as authentication, permissions or the server
+        being unavailable, fail as a whole.
+
+        :param pacing: Controls the pause between batches. Defaults to a new
+            :py:class:`~threatqsdk.upload.PacingController`.
+        :param int max_batch_objects: Maximum number of objects per request
+        :param int max_batch_bytes: Maximum size of a request, in bytes of JSON.
+            Within both limits, batches adapt to the server's latency, see
+            :py:class:`~threatqsdk.upload.BatchSizer`.
+        :param int concurrency: Maximum number of requests in flight
+        :param report: Collects the objects which failed to upload. Defaults
+            to a new :py:class:`~threatqsdk.upload.UploadReport`.
+        :type report: ~threatqsdk.upload.UploadReport
+        """
+
+        objects = [obj for obj in objects if obj]
         if not objects:
             return []
 
-        # Load the obejcts
-        data = [obj._to_dict(ignore=ignored_fields) for obj in objects if obj]
-        output = []
-        i = 0
-        batch = 500
+        if not all(obj.value or obj.name or obj.title for obj in objects):
+            raise ValueError("Threat Object has no value or name!")
 
-        # Create batches to upload
-        while i < len(data):
-            delay = randint(1, 3)
-            if show_debug:
-                logger.debug(f"Bulk uploading [{objects[0].api_name}] entries {i} - {i + batch}")
+        api_name = objects[0].api_name
+        index = ReconciliationIndex(objects, tq=tq)
+        pacing = pacing or PacingController()
+        sizer = BatchSizer(max_objects=max_batch_objects, max_bytes=max_batch_bytes)
+        report = report if report is not None else UploadReport()
+
+        # Upload the objects describing the same ThreatQ object once, merged together
+        duplicates = {}
+        for obj in objects:
+            duplicates.setdefault(object_key(obj), []).append(obj)
+        unique = [group[0] if len(group) == 1 else ThreatQObject.merge_objects(group) for group in duplicates.values()]
+        if show_debug and len(unique) < len(objects):
+            logger.debug(f"Merged {len(objects)} [{api_name}] entries into {len(unique)}")
+
+        batches = sizer.batches(sizer.measure(obj._to_dict(ignore=ignored_fields) for obj in unique))
+        output = []
 
+        def upload(batch):
+            started = time.monotonic()
             try:
-                # Upload the objects
-                res = tq.post(f"/api/{objects[0].api_name}/consume", data=data[i : i + batch])
-                res = [] if not res else res.get("data", [])
-                output.extend(res)
-
-                # Load in the ID from the upload
-                for item in res:
-                    for obj in objects:
-                        if (
-                            (obj.name and obj.name == item.get("name"))
-                            or (obj.value and obj.value == item.get("value"))
-                            or (obj.title and obj.title == item.get("title"))
-                        ):
-                            obj._set_id(item.get("id"))
-                            break
-            except Exception:
-                logger.error(f"Failed to upload entries {i} - {i + batch}. Continuing...")
-
-            sleep(delay)
-            i += batch
-
+                res = tq.post(f"/api/{api_name}/consume", body=encode_batch(batch))
+            except Exception as e:
+                return None, time.monotonic() - started, e
+
+            return [] if not res else res.get("data", []), time.monotonic() - started, None
+
+        # Keep up to `concurrency` batches in flight, serializing the next one meanwhile
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="threatq-upload") as executor:
+            in_flight = deque()
+            start = 0
+            batch = next(batches, None)
+            while batch is not None or in_flight:
+                while batch is not None and len(in_flight) < max(1, concurrency):
+                    if show_debug:
+                        logger.debug(f"Bulk uploading [{api_name}] entries {start} - {start + len(batch)}")
+                    in_flight.append((start, batch, executor.submit(upload, batch)))
+                    start += len(batch)
+                    batch = next(batches, None)
+
+                first, sent, future = in_flight.popleft()
+                res, latency, error = future.result()
+                pacing.record(latency, error=error)
+                sizer.record(len(sent), latency, error=error)
+                if error is None:
+                    # Load in the ID from the upload
+                    output.extend(res)
+                    index.assign(api_name, res)
+                elif len(sent) > 1 and is_splittable(error):
+                    # Split the batch, uploading both halves ahead of the queued batches
+                    logger.warning(f"Failed to upload entries {first} - {first + len(sent)}: {error}. Splitting the batch...")
+                    half = len(sent) // 2
+                    in_flight.appendleft((first + half, sent[half:], executor.submit(upload, sent[half:])))
+                    in_flight.appendleft((first, sent[:half], executor.submit(upload, sent[:half])))
+                else:
+                    logger.error(f"Failed to upload entries {first} - {first + len(sent)}: {error}. Continuing...")
+                    report.add(api_name, [codec.loads(piece) for piece in sent], error, index=index)
+
+                # Only pause before sending another batch
+                if batch is not None:
+                    pacing.wait()
+
+        index.report()
         return output
 
     def _to_dict(self, ignore=[], for_api=True):
@@ -399,9 +602,9 @@ class ThreatQObject:
 
         if self.oid and "id" not in ignore:
             output["id"] = self.oid
-        if self.comments and "comments" not in ignore:
+        if self._comments and "comments" not in ignore:
             output["comments"] = self.comments
-        if self.attributes and "attributes" not in ignore:
+        if self._attributes and "attributes" not in ignore:
             self.attributes = ThreatQAttribute.merge_attributes(self.attributes)
             output["attributes"] = [attr.to_dict() for attr in self.attributes if attr and isinstance(attr, ThreatQAttribute)]
         if self.tlp and self.tlp in tlp_map and "tlp" not in ignore:
@@ -414,19 +617,19 @@ class ThreatQObject:
             output["type"] = {"name": self.type}
         if self.type_id and "type" not in ignore and "type_id" not in ignore:
             output["type_id"] = self.type_id
-        if self.sources and "sources" not in ignore:
+        if self._sources and "sources" not in ignore:
             self.sources = ThreatQSource.merge_sources(self.sources)  # Merge the sources by hierarchy
             output["sources"] = [src.to_dict() for src in self.sources if src and isinstance(src, ThreatQSource)]
         if self.happened_at and "happened_at" not in ignore:
             output["happened_at"] = self.happened_at
         if self.api_name == "indicators" and self.score is not None and "score" not in ignore and not for_api:
             output["score"] = self.score
-        if self.tags:
+        if self._tags:
             output["tags"] = self.tags
 
         # Add relationships
         if "relationships" not in ignore:
-            for k, v in self.relationships.items():
+            for k, v in (self._relationships or {}).items():
                 output[k] = []
                 for item in v:
                     # Only add if an ID is available
@@ -520,9 +723,13 @@ class ThreatQObject:
     def _get_api_suffix(self, obj_type):
         return obj_type._get_base_endpoint_name()
 
-    def get_related_objects(self, obj_type):
+    def get_related_objects(self, obj_type, prefetch=0):
         """
         Get related objects
+
+        :param obj_type: Class of the related objects
+        :param int prefetch: Maximum number of result pages fetched at once.
+            0 fetches them one after the other, without starting any thread.
         """
 
         if not self.oid:
@@ -532,12 +739,9 @@ class ThreatQObject:
         if obj_type == self.__class__ and suffix == "adversaries":
             return []
         endpoint = self._get_api_endpoint() + "/" + suffix
-        results = self.tq.get(endpoint)
-        if "data" not in results:
-            return []
 
         tr = []
-        for obj in results["data"]:
+        for obj in self.tq.iter_pages(endpoint, prefetch=prefetch):
             inst = obj_type(self.tq)
             inst.fill_from_api_response(obj)
             tr.append(inst)
@@ -626,6 +830,8 @@ class ThreatQObject:
 
 
 class ThreatQSource:
+    __slots__ = ("name", "tlp")
+
     def __init__(self, name, tlp=None):
         """
         An encapsulation of a ThreatQ source
@@ -662,28 +868,26 @@ class ThreatQSource:
         This is so we can apply TLPs by hierarchy.
         """
 
-        new_sources = []
+        merged = {}
         for i in source_list:
-            # Find a match
-            found = None
-            for j in new_sources:
-                if i.name == j.name:
-                    found = j
-                    break
+            # Keep anything which isn't a source as is
+            if not isinstance(i, ThreatQSource):
+                merged[id(i)] = i
+                continue
 
             # If there is no match, add the source
-            if not found:
-                new_sources.append(i)
+            j = merged.get(i.name)
+            if j is None:
+                merged[i.name] = i
                 continue
 
             # If there is a match, compare based on TLP hierarchy
-            # If the TLP is more "secret", remove old source and apply new one
+            # If the TLP is more "secret", apply the new source in place of the old one
             if (i.tlp and not j.tlp) or (i.tlp and j.tlp and i.tlp < j.tlp):
-                new_sources.remove(j)
-                new_sources.append(i)
+                merged[i.name] = i
 
         # Set the source list to the merged source list
-        return new_sources
+        return list(merged.values())
 
     def to_dict(self):
         output = {"name": self.name}
@@ -694,6 +898,10 @@ class ThreatQSource:
 
 
 class ThreatQAttribute:
+    __slots__ = ("_sources", "name", "tlp", "value")
+
+    sources = LazyContainer(list)
+
     def __init__(self, name, value, sources=None, tlp=None):
         """
         An encapsulation of a ThreatQ attribute
@@ -705,39 +913,41 @@ class ThreatQAttribute:
             - tlp (str,int): Default TLP for the attribute
         """
 
-        if sources is None:
-            sources = []
         self.name = name
         self.value = value
-        self.sources = ThreatQSource.make_source_list(sources)
+        self._sources = ThreatQSource.make_source_list(sources) if sources else None
         self.tlp = ThreatQObject.parse_tlp(tlp)
 
     @staticmethod
     def merge_attributes(attribute_list):
         """
-        Merge sources with the same name together.
-        This is so we can apply TLPs by hierarchy.
+        Merge attributes with the same name and value together,
+        combining their sources.
         """
 
-        new_attrs = []
+        merged = {}
         for i in attribute_list:
-            # Find a match
-            found = None
-            for j in range(len(new_attrs)):
-                if i.name == new_attrs[j].name and i.value == new_attrs[j].value:
-                    found = j
-                    break
+            # Keep anything which isn't an attribute, or can't be matched, as is
+            key = (i.name, i.value) if isinstance(i, ThreatQAttribute) else None
+            try:
+                j = merged.get(key)
+            except TypeError:  # Unhashable value
+                key = None
+            if key is None:
+                merged[id(i)] = i
+                continue
 
             # If there is no match, add the attribute
-            if not found:
-                new_attrs.append(i)
+            if j is None:
+                merged[key] = i
                 continue
 
             # If there is a match, merge the sources
-            new_attrs[j].sources.extend(i.sources)
+            if i._sources:
+                j.sources.extend(i._sources)
 
         # Set the source list to the merged source list
-        return new_attrs
+        return list(merged.values())
 
     def add_source(self, source, tlp=None):
         """
@@ -765,7 +975,7 @@ class ThreatQAttribute:
         if isinstance(output["value"], bool):
             output["value"] = "Yes" if output["value"] else "No"
 
-        if self.sources:
+        if self._sources:
             self.sources = ThreatQSource.merge_sources(self.sources)  # Merge the sources by hierarchy
             output["sources"] = [src.to_dict() for src in self.sources if src]
         if self.tlp:
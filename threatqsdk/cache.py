@@ -0,0 +1,283 @@
+###########################################################################################################
+# File: cache.py
+#
+# ThreatQuotient Proprietary and Confidential
+# Copyright (c) 2016-2026 ThreatQuotient, Inc. All rights reserved.
+#
+# NOTICE: All information contained herein, is, and remains the property of ThreatQuotient, Inc.
+# The intellectual and technical concepts contained herein are proprietary to ThreatQuotient, Inc.
+# and its suppliers and may be covered by U.S. and Foreign Patents, patents in process, and are
+# protected by trade secret or copyright law.
+#
+# Dissemination of this information or reproduction of this material is strictly forbidden unless prior
+# written permission is obtained from ThreatQuotient, Inc.
+#
+# Licensed under Apache 2.0 (https://www.apache.org/licenses/LICENSE-2.0.txt)
+###########################################################################################################
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from logging import getLogger
+from urllib.parse import urlencode
+
+
+_logger = getLogger(__name__)
+
+# Endpoints of the lookups worth caching: vocabularies, users and the object catalog, which rarely change
+CACHEABLE_ENDPOINTS = (
+    "/api/objects",
+    "/api/users",
+    "/api/indicator/types",
+    "/api/indicator/statuses",
+    "/api/event/types",
+    "/api/signature/types",
+    "/api/attachments/types",
+)
+
+
+class ResponseCache:
+    """An LRU cache of ``GET`` responses, revalidated with conditional requests
+
+    Only responses of the lookup ``endpoints``, such as indicator types and
+    users, are cached: object queries are read once and can be large.
+    Responses carrying an ``ETag`` or ``Last-Modified`` header are kept for
+    up to ``ttl`` seconds. Repeating the request sends ``If-None-Match`` /
+    ``If-Modified-Since``, and a ``304 Not Modified`` answer is served from
+    the cache, so unchanged lists aren't transferred again.
+
+    Entries are kept in memory. When ``directory`` is given, they are also
+    written there (one file per entry) so that they are shared by every
+    process on the host, e.g. successive action runs. The directory is
+    trimmed to ``maxsize`` entries on the first write, then once every
+    ``maxsize // 8`` writes, so it may briefly hold a few more.
+
+    Keys include the user a response was returned to (see
+    :py:meth:`make_key`), so users with different permissions never share
+    entries.
+
+    :param int maxsize: Maximum number of entries kept, in memory and on disk
+    :param float ttl: Seconds an entry is kept before it is dropped
+    :param int max_body_size: Responses larger than this many bytes aren't cached
+    :param str directory: Optional directory to persist entries in
+    :param endpoints: Endpoints whose responses are cached
+    """
+
+    def __init__(self, maxsize=128, ttl=300, max_body_size=1024 * 1024, directory=None, endpoints=CACHEABLE_ENDPOINTS):
+        self.endpoints = frozenset(endpoints)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_body_size = max_body_size
+        self.directory = directory
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._writes = 0
+
+    def caches(self, endpoint):
+        """Determine if the responses of an endpoint are cached
+
+        :param str endpoint: The endpoint requested
+
+        :returns: True if the endpoint is one of the cached ``endpoints``
+        """
+        return endpoint.rstrip("/") in self.endpoints
+
+    @staticmethod
+    def make_key(endpoint, params=None, user=None):
+        """Build the key a response is cached under
+
+        :param str endpoint: The endpoint requested
+        :param dict params: URL parameters of the request
+        :param str user: Identity the request was authenticated as, see
+            :py:attr:`~threatqsdk.authentication.TokenHolder.identity`.
+            Only a hash of it is kept in the key.
+
+        :returns: String key
+        """
+        key = endpoint
+        if params:
+            key += "?" + urlencode(sorted(params.items()), doseq=True)
+        if user:
+            key = hashlib.sha256(user.encode("utf-8")).hexdigest()[:16] + ":" + key
+
+        return key
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+    def _read_file(self, key):
+        try:
+            with open(self._path(key)) as inf:
+                entry = json.load(inf)
+        except (OSError, ValueError):
+            return None
+
+        # Guard against hash collisions and foreign files
+        if not isinstance(entry, dict) or entry.get("key") != key:
+            return None
+
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+
+        return entry
+
+    def _write_file(self, key, entry):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as outf:
+                json.dump(entry, outf)
+            os.replace(tmp_path, path)
+            with self._lock:
+                trim = self._writes % max(1, self.maxsize // 8) == 0
+                self._writes += 1
+            if trim:
+                self._trim_directory()
+        except OSError as e:
+            _logger.debug(f"Failed to write response cache entry {path}: {e}")
+
+    def _trim_directory(self):
+        """Remove the least recently used files past ``maxsize``"""
+        with os.scandir(self.directory) as it:
+            files = [(f.stat().st_mtime, f.path) for f in it if f.name.endswith(".json")]
+
+        files.sort()
+        for _, path in files[: max(0, len(files) - self.maxsize)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _discard_file(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def get(self, key):
+        """Get a cached response
+
+        :param str key: Key from :py:meth:`make_key`
+
+        :returns: The entry ``dict``, with ``body``, ``etag`` and
+            ``last_modified`` keys, or None if nothing fresh is cached
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is None and self.directory:
+            entry = self._read_file(key)
+            if entry is not None:
+                self._remember(key, entry)
+
+        if entry is None:
+            return None
+
+        if time.time() - entry["stored_at"] >= self.ttl:
+            self.discard(key)
+            return None
+
+        return entry
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def store(self, key, response):
+        """Cache a response, if it can be revalidated
+
+        :param str key: Key from :py:meth:`make_key`
+        :param response: A successful response
+        :type response: ~requests.Response
+        """
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+
+        if len(response.content) > self.max_body_size:
+            return
+
+        try:
+            body = response.content.decode("utf-8")
+        except UnicodeDecodeError:
+            return
+
+        entry = {"key": key, "etag": etag, "last_modified": last_modified, "body": body, "stored_at": time.time()}
+        self._remember(key, entry)
+        if self.directory:
+            self._write_file(key, entry)
+
+    def refresh(self, key, entry):
+        """Restart the time to live of an entry the server confirmed is unchanged
+
+        Only the in-memory copy is refreshed, to avoid rewriting the body on
+        every revalidation; a stale file is simply fetched again in full.
+
+        :param str key: Key from :py:meth:`make_key`
+        :param dict entry: Entry from :py:meth:`get`
+        """
+        self._remember(key, {**entry, "stored_at": time.time()})
+
+    def discard(self, key):
+        """Remove an entry, if present
+
+        :param str key: Key from :py:meth:`make_key`
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+        if self.directory:
+            self._discard_file(key)
+
+    def clear(self):
+        """Remove all the entries kept in memory, and on disk"""
+        with self._lock:
+            self._entries.clear()
+
+        if not self.directory:
+            return
+
+        try:
+            with os.scandir(self.directory) as it:
+                paths = [f.path for f in it if f.name.endswith(".json")]
+        except OSError:
+            return
+
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def conditional_headers(entry):
+        """Build the headers revalidating a cached response
+
+        :param dict entry: Entry from :py:meth:`get`, or None
+
+        :returns: ``dict`` of headers
+        """
+        headers = {}
+        if entry is None:
+            return headers
+
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        return headers
@@ -0,0 +1,132 @@
+###########################################################################################################
+# File: codec.py
+#
+# ThreatQuotient Proprietary and Confidential
+# Copyright (c) 2016-2026 ThreatQuotient, Inc. All rights reserved.
+#
+# NOTICE: All information contained herein, is, and remains the property of ThreatQuotient, Inc.
+# The intellectual and technical concepts contained herein are proprietary to ThreatQuotient, Inc.
+# and its suppliers and may be covered by U.S. and Foreign Patents, patents in process, and are
+# protected by trade secret or copyright law.
+#
+# Dissemination of this information or reproduction of this material is strictly forbidden unless prior
+# written permission is obtained from ThreatQuotient, Inc.
+#
+# Licensed under Apache 2.0 (https://www.apache.org/licenses/LICENSE-2.0.txt)
+###########################################################################################################
+
+import json
+from logging import getLogger
+
+
+_logger = getLogger(__name__)
+
+
+def _json_dumps(obj):
+    return json.dumps(obj)
+
+
+def _json_loads(data):
+    return json.loads(data)
+
+
+def _load_backends():
+    """Find the JSON libraries available, fastest first
+
+    :returns: Dictionary of library name to ``(dumps, loads)`` functions
+    """
+    backends = {}
+
+    try:
+        import orjson
+    except ImportError:
+        pass
+    else:
+
+        def orjson_dumps(obj):
+            try:
+                return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+            except TypeError:
+                # orjson is stricter than json, e.g. on integers wider than 64 bits
+                return json.dumps(obj)
+
+        backends["orjson"] = (orjson_dumps, orjson.loads)
+
+    try:
+        import ujson
+    except ImportError:
+        pass
+    else:
+
+        def ujson_dumps(obj):
+            try:
+                return ujson.dumps(obj, escape_forward_slashes=False)
+            except (TypeError, OverflowError):
+                return json.dumps(obj)
+
+        backends["ujson"] = (ujson_dumps, ujson.loads)
+
+    backends["json"] = (_json_dumps, _json_loads)
+    return backends
+
+
+BACKENDS = _load_backends()
+
+# Name of the library in use
+backend = None
+_dumps = _json_dumps
+_loads = _json_loads
+
+
+def use(name=None):
+    """Select the JSON library used for request and response bodies
+
+    :param str name: ``orjson``, ``ujson`` or ``json``. None picks the
+        fastest one installed.
+
+    :raises: :py:class:`ValueError` if the library isn't installed
+    """
+    global backend, _dumps, _loads
+
+    if name is None:
+        name = next(iter(BACKENDS))
+    elif name not in BACKENDS:
+        raise ValueError(f"JSON library not available: {name}")
+
+    backend = name
+    _dumps, _loads = BACKENDS[name]
+    _logger.debug(f"Using {name} for JSON bodies")
+
+
+def dumps(obj):
+    """Serialize an object to JSON
+
+    :returns: JSON document, as ``str`` or UTF-8 ``bytes`` depending on
+        the library in use
+    """
+    return _dumps(obj)
+
+
+def dumpb(obj):
+    """Serialize an object to JSON bytes
+
+    :returns: UTF-8 encoded JSON document
+    """
+    body = _dumps(obj)
+    return body.encode("utf-8") if isinstance(body, str) else body
+
+
+def loads(data):
+    """Deserialize a JSON document
+
+    :param data: JSON document
+    :type data: str or bytes
+
+    :raises: :py:class:`ValueError` if the document isn't valid JSON
+
+    :returns: The deserialized object
+    """
+    return _loads(data)
+
+
+use()
@@ -0,0 +1,198 @@
+###########################################################################################################
+# File: concurrency.py
+#
+# ThreatQuotient Proprietary and Confidential
+# Copyright (c) 2016-2026 ThreatQuotient, Inc. All rights reserved.
+#
+# NOTICE: All information contained herein, is, and remains the property of ThreatQuotient, Inc.
+# The intellectual and technical concepts contained herein are proprietary to ThreatQuotient, Inc.
+# and its suppliers and may be covered by U.S. and Foreign Patents, patents in process, and are
+# protected by trade secret or copyright law.
+#
+# Dissemination of this information or reproduction of this material is strictly forbidden unless prior
+# written permission is obtained from ThreatQuotient, Inc.
+#
+# Licensed under Apache 2.0 (https://www.apache.org/licenses/LICENSE-2.0.txt)
+###########################################################################################################
+
+import asyncio
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+
+
+# A single API request: the Threatq method name ("get", "post", "put" or
+# "delete"), the endpoint, and the keyword arguments of that method
+RequestSpec = namedtuple("RequestSpec", ["method", "endpoint", "kwargs"], defaults=[None])
+
+# The outcome of one call made by run_concurrently: its return value, or the exception it raised
+CallResult = namedtuple("CallResult", ["result", "error"])
+
+
+def run_concurrently(func, items, concurrency):
+    """Call a function on each item using a bounded pool of threads
+
+    :param func: Function taking a single item
+    :param items: Iterable of items
+    :param int concurrency: Maximum number of calls running at once
+
+    :returns: List of :py:data:`CallResult`, in the order of the items. A
+        call which raised has its exception in ``error``, and None in ``result``.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    def call(item):
+        try:
+            return CallResult(func(item), None)
+        except Exception as e:
+            return CallResult(None, e)
+
+    with ThreadPoolExecutor(max_workers=min(len(items), max(1, concurrency)), thread_name_prefix="threatq") as executor:
+        return list(executor.map(call, items))
+
+
+def iter_prefetched(func, items, depth):
+    """Call a function on each item, running up to ``depth`` calls ahead
+    of the consumer
+
+    Unlike :py:func:`run_concurrently`, results are yielded as soon as they
+    are ready (in the order of the items), and new calls are only started
+    as results are consumed, so at most ``depth`` results are ever held.
+    Calls which haven't started when the generator is closed are cancelled.
+
+    :param func: Function taking a single item
+    :param items: Iterable of items
+    :param int depth: Maximum number of calls in flight
+
+    :raises: Any exception raised by a call, when its result is reached
+
+    :returns: Generator of the return values, in the order of the items
+    """
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=max(1, depth), thread_name_prefix="threatq") as executor:
+        pending = deque(executor.submit(func, item) for item in islice(items, max(1, depth)))
+        try:
+            while pending:
+                result = pending.popleft().result()
+                for item in islice(items, 1):
+                    pending.append(executor.submit(func, item))
+                yield result
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def send(tq, spec):
+    """Make the request described by a :py:data:`RequestSpec`
+
+    :param tq: ThreatQuotient connection
+    :type tq: ~threatqsdk.Threatq
+
+    :returns: JSON-decoded API response
+    """
+    return getattr(tq, spec.method.lower())(spec.endpoint, **(spec.kwargs or {}))
+
+
+def fan_out(tq, specs, concurrency=None):
+    """Make many independent requests concurrently
+
+    :param tq: ThreatQuotient connection
+    :type tq: ~threatqsdk.Threatq
+    :param specs: Iterable of :py:data:`RequestSpec`
+    :param int concurrency: Maximum number of requests in flight. Defaults
+        to the connection's ``pool_maxsize``.
+
+    :returns: List of :py:data:`CallResult`, in the order of the specs,
+        holding each JSON-decoded API response or the exception raised
+    """
+    return run_concurrently(partial(send, tq), specs, concurrency or tq.pool_maxsize)
+
+
+class AsyncThreatq:
+    """A coroutine facade over a ThreatQ connection, for asyncio code
+
+    Exposes the same ``get``, ``post``, ``put`` and ``delete`` methods as
+    :py:class:`~threatqsdk.Threatq`, as coroutines. The requests are made
+    by the wrapped synchronous connection on worker threads, so they share
+    its session, access token (refreshed once for all concurrent requests),
+    retry policy, rate limiter and circuit breaker; the I/O itself isn't
+    asynchronous. At most ``concurrency`` requests run at once.
+
+    :param tq: ThreatQuotient connection
+    :type tq: ~threatqsdk.Threatq
+    :param int concurrency: Maximum number of requests in flight. Defaults
+        to the connection's ``pool_maxsize``, so no request waits on a
+        connection.
+    """
+
+    def __init__(self, tq, concurrency=None):
+        self.tq = tq
+        self.concurrency = max(1, concurrency or tq.pool_maxsize)
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="threatq")
+
+    def close(self):
+        """Shut down the worker threads"""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    async def _call(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def get(self, endpoint, withp=None, params=None):
+        """Coroutine version of :py:meth:`threatqsdk.Threatq.get`"""
+        return await self._call(self.tq.get, endpoint, withp=withp, params=params)
+
+    async def post(self, endpoint, data=None, files=None, params=None, body=None, deadline=None):
+        """Coroutine version of :py:meth:`threatqsdk.Threatq.post`"""
+        return await self._call(self.tq.post, endpoint, data=data, files=files, params=params, body=body, deadline=deadline)
+
+    async def put(self, endpoint, data=None, params=None):
+        """Coroutine version of :py:meth:`threatqsdk.Threatq.put`"""
+        return await self._call(self.tq.put, endpoint, data=data, params=params)
+
+    async def delete(self, endpoint):
+        """Coroutine version of :py:meth:`threatqsdk.Threatq.delete`"""
+        return await self._call(self.tq.delete, endpoint)
+
+    async def request(self, spec):
+        """Make the request described by a :py:data:`RequestSpec`
+
+        :returns: JSON-decoded API response
+        """
+        return await self._call(send, self.tq, spec)
+
+    async def gather(self, specs):
+        """Make many requests concurrently
+
+        :param specs: Iterable of :py:data:`RequestSpec`
+
+        :returns: List of :py:data:`CallResult`, in the order of the specs,
+            holding each JSON-decoded API response or the exception raised
+        """
+
+        async def call(spec):
+            try:
+                return CallResult(await self.request(spec), None)
+            except Exception as e:
+                return CallResult(None, e)
+
+        return list(await asyncio.gather(*[call(spec) for spec in specs]))
+
+    def run_batch(self, specs):
+        """Make many requests concurrently, from synchronous code, with :py:func:`fan_out`
+
+        :param specs: Iterable of :py:data:`RequestSpec`
+
+        :returns: List of :py:data:`CallResult`, in the order of the specs,
+            holding each JSON-decoded API response or the exception raised
+        """
+        return fan_out(self.tq, specs, concurrency=self.concurrency)
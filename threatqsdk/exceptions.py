@@ -15,6 +15,8 @@
 # Licensed under Apache 2.0 (https://www.apache.org/licenses/LICENSE-2.0.txt)
 ###########################################################################################################
 
+from . import codec
+
 
 class AuthenticationError(Exception):
     """Raised when the ThreatQ API doese not give us an access token
@@ -38,7 +40,7 @@ class APIError(Exception):
         else:
             super().__init__()
         self.response = response
-        self.errors = response.json()["errors"]
+        self.errors = codec.loads(response.content)["errors"]
 
 
 class NotCreatedError(Exception):
@@ -78,3 +80,15 @@ class ActionFailedError(Exception):
 
     def __init__(self, response):
         self.response = response
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of making a request while ThreatQ is considered down
+
+    Provides a ``retry_in`` property with the number of seconds until the
+    next request will be let through
+    """
+
+    def __init__(self, retry_in):
+        super().__init__(f"ThreatQ is unavailable. Not sending requests for another {int(retry_in) + 1} seconds")
+        self.retry_in = retry_in
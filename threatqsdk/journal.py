@@ -0,0 +1,283 @@
+###########################################################################################################
+# File: journal.py
+#
+# ThreatQuotient Proprietary and Confidential
+# Copyright (c) 2016-2026 ThreatQuotient, Inc. All rights reserved.
+#
+# NOTICE: All information contained herein, is, and remains the property of ThreatQuotient, Inc.
+# The intellectual and technical concepts contained herein are proprietary to ThreatQuotient, Inc.
+# and its suppliers and may be covered by U.S. and Foreign Patents, patents in process, and are
+# protected by trade secret or copyright law.
+#
+# Dissemination of this information or reproduction of this material is strictly forbidden unless prior
+# written permission is obtained from ThreatQuotient, Inc.
+#
+# Licensed under Apache 2.0 (https://www.apache.org/licenses/LICENSE-2.0.txt)
+###########################################################################################################
+
+import os
+import sqlite3
+import time
+from contextlib import closing, contextmanager
+from logging import getLogger
+
+from . import codec
+from .upload import MAX_BATCH_BYTES, MAX_BATCH_OBJECTS, BatchSizer, encode_batch, is_overload, is_splittable
+
+
+_logger = getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    api_name TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    created REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    claimed_until REAL NOT NULL DEFAULT 0
+)
+"""
+
+
+class UploadJournal:
+    """A durable queue of objects waiting to be uploaded to ThreatQ
+
+    Objects are written to a SQLite database as they would be sent to the
+    ``consume`` endpoint of their collection, so an upload which can't be
+    made now (e.g. because ThreatQ is unreachable) is recorded in
+    milliseconds and replayed later by :py:meth:`drain`.
+
+    The database can be shared by every process on the host. Entries are
+    claimed for ``lease`` seconds before they are uploaded, so concurrent
+    drains don't upload the same entries, and entries claimed by a process
+    which died are picked up again once the lease expires. Entries are only
+    removed once ThreatQ has accepted them, and as ``consume`` creates or
+    updates objects by value, replaying an entry which was uploaded but not
+    yet removed is harmless.
+
+    :param str path: Path of the database file
+    :param float lease: Seconds a drain may take to upload the entries it claimed
+    :param int max_attempts: Number of times ThreatQ may reject an entry
+        before it is dropped from the journal
+    """
+
+    def __init__(self, path, lease=300, max_attempts=5):
+        self.path = path
+        self.lease = lease
+        self.max_attempts = max_attempts
+
+        if not os.path.exists(path):
+            os.close(os.open(path, os.O_WRONLY | os.O_CREAT, 0o600))
+
+        with self._transaction() as db:
+            db.execute(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        with closing(sqlite3.connect(self.path, timeout=30, isolation_level=None)) as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=FULL")
+            yield db
+
+    @contextmanager
+    def _transaction(self):
+        """Run the block in a write transaction, committed if it succeeds"""
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    def append(self, api_name, items):
+        """Record objects to upload
+
+        :param str api_name: API name of the collection to upload to
+        :param list items: Serialized objects (``dict``), as sent to ``consume``
+
+        :returns: Number of entries recorded
+        """
+        now = time.time()
+        rows = [(api_name, codec.dumpb(item), now) for item in items]
+        with self._transaction() as db:
+            db.executemany("INSERT INTO entries (api_name, payload, created) VALUES (?, ?, ?)", rows)
+
+        _logger.debug(f"Queued {len(rows)} [{api_name}] object(s) in {self.path}")
+        return len(rows)
+
+    def pending(self):
+        """Count the entries waiting to be uploaded, claimed or not
+
+        :returns: Number of entries
+        """
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM entries WHERE attempts < ?", (self.max_attempts,)).fetchone()[0]
+
+    def claim(self, limit):
+        """Claim the oldest unclaimed entries for upload
+
+        :param int limit: Maximum number of entries to claim
+
+        :returns: List of ``(entry ID, api_name, JSON bytes of the object)``
+        """
+        now = time.time()
+        with self._transaction() as db:
+            rows = db.execute(
+                "SELECT id, api_name, payload FROM entries WHERE claimed_until < ? AND attempts < ? ORDER BY id LIMIT ?",
+                (now, self.max_attempts, limit),
+            ).fetchall()
+            db.executemany("UPDATE entries SET claimed_until = ? WHERE id = ?", [(now + self.lease, row[0]) for row in rows])
+
+        return [(entry_id, api_name, payload.encode("utf-8") if isinstance(payload, str) else payload) for entry_id, api_name, payload in rows]
+
+    def acknowledge(self, entry_ids):
+        """Remove entries which were uploaded
+
+        :param list entry_ids: IDs of the entries
+        """
+        with self._transaction() as db:
+            db.executemany("DELETE FROM entries WHERE id = ?", [(entry_id,) for entry_id in entry_ids])
+
+    def release(self, entry_ids, error=None):
+        """Give up the claim on entries which weren't uploaded
+
+        :param list entry_ids: IDs of the entries
+        :param Exception error: If the entries were rejected by ThreatQ, the
+            error raised. This counts as an attempt, and the entries stay
+            claimed until the lease expires, so they are only retried by a
+            later drain. Entries rejected ``max_attempts`` times are dropped.
+        """
+        with self._transaction() as db:
+            if error is None:
+                db.executemany("UPDATE entries SET claimed_until = 0 WHERE id = ?", [(entry_id,) for entry_id in entry_ids])
+                return
+
+            db.executemany(
+                "UPDATE entries SET attempts = attempts + 1, last_error = ? WHERE id = ?",
+                [(str(error)[:1000], entry_id) for entry_id in entry_ids],
+            )
+            dropped = db.execute("DELETE FROM entries WHERE attempts >= ?", (self.max_attempts,)).rowcount
+
+        if dropped:
+            _logger.error(f"Dropped {dropped} queued entries rejected {self.max_attempts} times by ThreatQ: {error}")
+
+    def drain(self, tq, max_entries=None, max_seconds=None, max_batch_objects=MAX_BATCH_OBJECTS, max_batch_bytes=MAX_BATCH_BYTES):
+        """Upload the queued entries, oldest first
+
+        Entries are uploaded in batches, and removed once ThreatQ has accepted
+        them. A batch rejected as invalid is split in half until the rejected
+        entries are isolated, as in
+        :py:meth:`~threatqsdk.bulk_object.ThreatQObject.bulk_upload`; those
+        are kept for up to ``max_attempts`` drains.
+        Draining stops as soon as ThreatQ is overloaded or unreachable, or
+        ``max_seconds`` have passed, leaving the remaining entries queued.
+        Requests in flight, including their retries, are cut short at that
+        time.
+
+        :param tq: ThreatQ connection
+        :type tq: ~threatqsdk.Threatq
+        :param int max_entries: Maximum number of entries to upload. None
+            drains the whole queue.
+        :param float max_seconds: Time after which no more batches are
+            uploaded. None drains without a time limit.
+        :param int max_batch_objects: Maximum number of objects per request
+        :param int max_batch_bytes: Maximum size of a request, in bytes of JSON
+
+        :returns: Number of entries uploaded
+        """
+        sizer = BatchSizer(max_objects=max_batch_objects, max_bytes=max_batch_bytes)
+        deadline = None if max_seconds is None else time.monotonic() + max_seconds
+        uploaded = 0
+        claimed = 0
+        while max_entries is None or claimed < max_entries:
+            limit = sizer.max_objects if max_entries is None else min(sizer.max_objects, max_entries - claimed)
+            entries = self.claim(limit)
+            if not entries:
+                break
+            claimed += len(entries)
+
+            by_api_name = {}
+            for entry in entries:
+                by_api_name.setdefault(entry[1], []).append(entry)
+
+            settled = set()
+            try:
+                for api_name, group in by_api_name.items():
+                    for batch in sizer.batches((entry, len(entry[2])) for entry in group):
+                        uploaded += self._replay(tq, api_name, batch, sizer, settled, deadline)
+            except _Stopped as e:
+                # Rejected entries stay claimed, so only the entries left to upload are released
+                self.release([entry[0] for entry in entries if entry[0] not in settled])
+                _logger.warning(f"Stopped draining the upload journal: {e}. {self.pending()} entries left")
+                break
+
+        return uploaded
+
+    def _replay(self, tq, api_name, entries, sizer, settled, deadline=None):
+        """Upload a batch of entries, splitting it if ThreatQ rejects it
+
+        :param set settled: IDs of the entries uploaded or rejected, updated
+            as the batch is
+        :param float deadline: ``time.monotonic()`` after which no more
+            requests are sent
+
+        :raises: :py:class:`_Stopped` if ThreatQ is overloaded or unreachable,
+            or the deadline has passed
+
+        :returns: Number of entries uploaded
+        """
+        if deadline is not None and time.monotonic() >= deadline:
+            raise _Stopped("out of time")
+
+        error = self._post(tq, api_name, entries, sizer, deadline)
+        return self._settle(tq, api_name, entries, error, sizer, settled, deadline)
+
+    def _post(self, tq, api_name, entries, sizer, deadline=None):
+        """Upload a batch of entries, giving up on the request and its retries at the deadline
+
+        :raises: :py:class:`_Stopped` if ThreatQ is overloaded or unreachable,
+            or the request ran out of time
+
+        :returns: The error raised if ThreatQ rejected the batch, else None
+        """
+        started = time.monotonic()
+        try:
+            tq.post(f"/api/{api_name}/consume", body=encode_batch([entry[2] for entry in entries]), deadline=deadline)
+        except Exception as e:
+            sizer.record(len(entries), time.monotonic() - started, error=e)
+            if is_overload(e):
+                raise _Stopped(str(e))
+            return e
+
+        sizer.record(len(entries), time.monotonic() - started)
+        return None
+
+    def _settle(self, tq, api_name, entries, error, sizer, settled, deadline=None):
+        """Remove the entries of an uploaded batch, or split a rejected batch
+        until the rejected entries are isolated, down to single entries
+
+        :returns: Number of entries uploaded
+        """
+        entry_ids = [entry[0] for entry in entries]
+        if error is None:
+            self.acknowledge(entry_ids)
+            settled.update(entry_ids)
+            return len(entries)
+
+        if len(entries) > 1 and is_splittable(error):
+            half = len(entries) // 2
+            return self._replay(tq, api_name, entries[:half], sizer, settled, deadline) + self._replay(
+                tq, api_name, entries[half:], sizer, settled, deadline
+            )
+
+        _logger.error(f"ThreatQ rejected {len(entries)} queued [{api_name}] entries from {entry_ids[0]}: {error}")
+        self.release(entry_ids, error=error)
+        settled.update(entry_ids)
+        return 0
+
+
+class _Stopped(Exception):
+    """Raised to stop draining when ThreatQ can't take uploads, or the drain is out of time"""
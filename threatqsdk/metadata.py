@@ -0,0 +1,118 @@
+###########################################################################################################
+# File: metadata.py
+#
+# ThreatQuotient Proprietary and Confidential
+# Copyright (c) 2016-2026 ThreatQuotient, Inc. All rights reserved.
+#
+# NOTICE: All information contained herein, is, and remains the property of ThreatQuotient, Inc.
+# The intellectual and technical concepts contained herein are proprietary to ThreatQuotient, Inc.
+# and its suppliers and may be covered by U.S. and Foreign Patents, patents in process, and are
+# protected by trade secret or copyright law.
+#
+# Dissemination of this information or reproduction of this material is strictly forbidden unless prior
+# written permission is obtained from ThreatQuotient, Inc.
+#
+# Licensed under Apache 2.0 (https://www.apache.org/licenses/LICENSE-2.0.txt)
+###########################################################################################################
+
+import threading
+import time
+from collections import namedtuple
+from logging import getLogger
+
+
+_logger = getLogger(__name__)
+
+# Endpoint and URL parameters listing each vocabulary
+VOCABULARIES = {
+    "indicator_types": ("/api/indicator/types", None),
+    "indicator_statuses": ("/api/indicator/statuses", None),
+    "event_types": ("/api/event/types", None),
+    "parsers": ("/api/attachments/types", {"is_parsable": "Y"}),
+    "signature_types": ("/api/signature/types", None),
+}
+
+# A loaded vocabulary: id to name and name to id maps, and when it was loaded
+Vocabulary = namedtuple("Vocabulary", ["by_id", "by_name", "loaded_at"])
+
+
+class MetadataRegistry:
+    """Lookups between the IDs and names of ThreatQ vocabularies, such as
+    indicator types and statuses
+
+    Each vocabulary is downloaded the first time it is needed, and indexed
+    both ways. It is downloaded again once it is ``ttl`` seconds old, or
+    after :py:meth:`invalidate`.
+
+    :param tq: ThreatQuotient connection
+    :type tq: ~threatqsdk.Threatq
+    :param float ttl: Seconds before a vocabulary is downloaded again
+    """
+
+    def __init__(self, tq, ttl=600):
+        self.tq = tq
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._vocabularies = {}
+
+    def get(self, vocabulary):
+        """Get a vocabulary, downloading it if needed
+
+        :param str vocabulary: One of :py:data:`VOCABULARIES`
+
+        :returns: The :py:data:`Vocabulary`, or None if it couldn't be loaded
+        """
+        with self._lock:
+            loaded = self._vocabularies.get(vocabulary)
+            if loaded is not None and time.monotonic() - loaded.loaded_at < self.ttl:
+                return loaded
+
+            endpoint, params = VOCABULARIES[vocabulary]
+            res = self.tq.get(endpoint, params=dict(params) if params else None)
+            if not res:
+                _logger.debug(f"Failed to get {vocabulary.replace('_', ' ')}")
+                return None
+
+            by_id = {}
+            by_name = {}
+            for item in res.get("data", []):
+                by_id.setdefault(item["id"], item["name"])
+                by_name.setdefault(item["name"], item["id"])
+
+            loaded = Vocabulary(by_id, by_name, time.monotonic())
+            self._vocabularies[vocabulary] = loaded
+            return loaded
+
+    def name_of(self, vocabulary, oid):
+        """Get the name of an entry from its ID
+
+        :param str vocabulary: One of :py:data:`VOCABULARIES`
+        :param int oid: ID to find
+
+        :returns: String name, or None if the ID isn't found
+        """
+        loaded = self.get(vocabulary)
+        return loaded.by_id.get(oid) if loaded else None
+
+    def id_of(self, vocabulary, name):
+        """Get the ID of an entry from its name
+
+        :param str vocabulary: One of :py:data:`VOCABULARIES`
+        :param str name: Name to find
+
+        :returns: Integer ID, or None if the name isn't found
+        """
+        loaded = self.get(vocabulary)
+        return loaded.by_name.get(name) if loaded else None
+
+    def invalidate(self, vocabulary=None):
+        """Forget a vocabulary, so that it is downloaded again when next needed
+
+        :param str vocabulary: Vocabulary to forget. None forgets all of them.
+        """
+        with self._lock:
+            if vocabulary is None:
+                self._vocabularies.clear()
+            else:
+                self._vocabularies.pop(vocabulary, None)
@@ -0,0 +1,131 @@
+###########################################################################################################
+# File: ratelimit.py
+#
+# ThreatQuotient Proprietary and Confidential
+# Copyright (c) 2016-2026 ThreatQuotient, Inc. All rights reserved.
+#
+# NOTICE: All information contained herein, is, and remains the property of ThreatQuotient, Inc.
+# The intellectual and technical concepts contained herein are proprietary to ThreatQuotient, Inc.
+# and its suppliers and may be covered by U.S. and Foreign Patents, patents in process, and are
+# protected by trade secret or copyright law.
+#
+# Dissemination of this information or reproduction of this material is strictly forbidden unless prior
+# written permission is obtained from ThreatQuotient, Inc.
+#
+# Licensed under Apache 2.0 (https://www.apache.org/licenses/LICENSE-2.0.txt)
+###########################################################################################################
+
+import threading
+import time
+from contextlib import contextmanager
+from logging import getLogger
+
+from .shared_state import locked_json
+
+
+_logger = getLogger(__name__)
+
+
+class RateLimiter:
+    """A token bucket limiting the rate of requests, plus a cap on how
+    many requests may be in flight at once.
+
+    The bucket holds up to ``burst`` tokens and refills at ``rate`` tokens
+    per second; each request takes one token, waiting for one if the bucket
+    is empty.
+
+    When ``shared_path`` is given, the bucket is kept in that file and
+    updated under an exclusive lock, so every process on the host using the
+    same file draws from a single budget. The in-flight cap always applies
+    per process.
+
+    :param float rate: Requests per second. None or 0 disables rate limiting.
+    :param int burst: Maximum number of requests that can be made back to
+        back. Defaults to ``rate`` (rounded up), i.e. one second's worth.
+    :param int max_in_flight: Maximum concurrent requests. None disables
+        the cap.
+    :param str shared_path: Optional file to share the bucket through
+    """
+
+    def __init__(self, rate=None, burst=None, max_in_flight=None, shared_path=None):
+        self.rate = rate or 0
+        self.burst = max(1, burst or int(-(-self.rate // 1)))
+        self.shared_path = shared_path
+        self.in_flight = threading.BoundedSemaphore(max_in_flight) if max_in_flight else None
+
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    def _take_local(self):
+        """Take a token from the in-process bucket
+
+        :returns: Seconds to wait before a token is available, 0 if one was taken
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+
+            return (1 - self._tokens) / self.rate
+
+    def _take_shared(self):
+        """Take a token from the bucket shared through ``shared_path``
+
+        The file stores the token count and the wall-clock time it was last
+        updated, since monotonic clocks aren't comparable between processes.
+
+        :returns: Seconds to wait before a token is available, 0 if one was taken
+        """
+        with locked_json(self.shared_path) as state:
+            now = time.time()
+            try:
+                tokens = float(state["tokens"])
+                updated = float(state["updated"])
+            except (KeyError, TypeError, ValueError):
+                tokens, updated = float(self.burst), now
+
+            tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+            wait = 0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+
+            state.update({"tokens": tokens, "updated": now})
+
+        return wait
+
+    def acquire(self):
+        """Block until a request may be made under the rate limit"""
+        if not self.rate:
+            return
+
+        while True:
+            try:
+                wait = self._take_shared() if self.shared_path else self._take_local()
+            except OSError as e:
+                # Never fail requests because the shared state is unavailable
+                _logger.debug(f"Failed to use shared rate limit {self.shared_path}: {e}")
+                wait = self._take_local()
+
+            if not wait:
+                return
+
+            time.sleep(wait)
+
+    @contextmanager
+    def limit(self):
+        """Hold an in-flight slot and a rate limit token for the duration of the block"""
+        if self.in_flight is not None:
+            self.in_flight.acquire()
+
+        try:
+            self.acquire()
+            yield
+        finally:
+            if self.in_flight is not None:
+                self.in_flight.release()
@@ -0,0 +1,131 @@
+###########################################################################################################
+# File: retry.py
+#
+# ThreatQuotient Proprietary and Confidential
+# Copyright (c) 2016-2026 ThreatQuotient, Inc. All rights reserved.
+#
+# NOTICE: All information contained herein, is, and remains the property of ThreatQuotient, Inc.
+# The intellectual and technical concepts contained herein are proprietary to ThreatQuotient, Inc.
+# and its suppliers and may be covered by U.S. and Foreign Patents, patents in process, and are
+# protected by trade secret or copyright law.
+#
+# Dissemination of this information or reproduction of this material is strictly forbidden unless prior
+# written permission is obtained from ThreatQuotient, Inc.
+#
+# Licensed under Apache 2.0 (https://www.apache.org/licenses/LICENSE-2.0.txt)
+###########################################################################################################
+
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout
+
+
+# Methods which can be repeated without changing the result
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+# Status codes worth retrying: rate limited, or the server is temporarily unavailable
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+class RetryPolicy:
+    """Decides which failed requests to retry, and how long to wait in between
+
+    Only requests which are safe to repeat are retried: idempotent methods,
+    and ``POST`` requests to the ``consume`` endpoints (which create or update
+    objects by value, so uploading the same objects twice is harmless).
+
+    The wait between attempts follows capped exponential backoff with full
+    jitter, unless the server asks for a specific delay with ``Retry-After``.
+
+    :param int max_attempts: Maximum number of attempts per request,
+        including the first one. 1 disables retries.
+    :param float backoff_base: Base delay in seconds, doubled on each attempt
+    :param float backoff_max: Cap on the delay between attempts, in seconds
+    :param tuple retry_statuses: Status codes to retry
+    """
+
+    def __init__(self, max_attempts=4, backoff_base=1, backoff_max=30, retry_statuses=RETRY_STATUSES):
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_statuses = retry_statuses
+
+    @staticmethod
+    def is_repeatable(method, endpoint):
+        """Determine if a request can safely be sent more than once
+
+        :param str method: HTTP method
+        :param str endpoint: The endpoint hit
+
+        :returns: True if the request can be retried
+        """
+        method = method.upper()
+        if method in IDEMPOTENT_METHODS:
+            return True
+
+        return method == "POST" and endpoint.split("?")[0].rstrip("/").endswith("/consume")
+
+    def should_retry(self, attempt, response=None, error=None):
+        """Determine if another attempt should be made after a failure
+
+        :param int attempt: Number of attempts made so far
+        :param response: The response received, if any
+        :type response: ~requests.Response
+        :param Exception error: The error raised, if any
+
+        :returns: True if the request should be retried
+        """
+        if attempt >= self.max_attempts:
+            return False
+
+        if error is not None:
+            return isinstance(error, (RequestsConnectionError, Timeout))
+
+        return response is not None and response.status_code in self.retry_statuses
+
+    def get_delay(self, attempt, response=None):
+        """Get the number of seconds to wait before the next attempt
+
+        :param int attempt: Number of attempts made so far
+        :param response: The failed response, if any
+        :type response: ~requests.Response
+
+        :returns: Delay in seconds
+        """
+        retry_after = self.parse_retry_after(response)
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    @staticmethod
+    def parse_retry_after(response):
+        """Parse the ``Retry-After`` header of a response
+
+        The header holds either a number of seconds or an HTTP date.
+
+        :returns: Delay in seconds, or None if the header is missing or invalid
+        """
+        if response is None:
+            return None
+
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+
+        return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,74 @@
+###########################################################################################################
+# File: shared_state.py
+#
+# ThreatQuotient Proprietary and Confidential
+# Copyright (c) 2016-2026 ThreatQuotient, Inc. All rights reserved.
+#
+# NOTICE: All information contained herein, is, and remains the property of ThreatQuotient, Inc.
+# The intellectual and technical concepts contained herein are proprietary to ThreatQuotient, Inc.
+# and its suppliers and may be covered by U.S. and Foreign Patents, patents in process, and are
+# protected by trade secret or copyright law.
+#
+# Dissemination of this information or reproduction of this material is strictly forbidden unless prior
+# written permission is obtained from ThreatQuotient, Inc.
+#
+# Licensed under Apache 2.0 (https://www.apache.org/licenses/LICENSE-2.0.txt)
+###########################################################################################################
+
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def locked_json(path):
+    """Read-modify-write a small JSON state file shared between processes
+
+    The file is held under an exclusive lock for the duration of the block.
+    The yielded ``dict`` is the current state (empty if the file is missing or
+    invalid), and is written back to the file if it changed when the block
+    exits normally.
+
+    :param str path: Path of the state file
+
+    :raises: :py:class:`OSError` if the file can't be opened or written
+    """
+    with open(path, "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            raw = f.read()
+            try:
+                state = json.loads(raw or "{}")
+            except ValueError:
+                state = {}
+            if not isinstance(state, dict):
+                state = {}
+
+            yield state
+
+            # Writes always go to the end of a file opened for appending, which
+            # is its start once truncated
+            new_raw = json.dumps(state)
+            if new_raw != raw:
+                f.seek(0)
+                f.truncate()
+                f.write(new_raw)
+                f.flush()
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def make_shared_path(directory, prefix, host, suffix=".json"):
+    """Build the path of a file to share a host's state through
+
+    :param str directory: Directory to keep the file in
+    :param str prefix: Name of the kind of state kept in the file
+    :param str host: ThreatQ host the state applies to
+    :param str suffix: Extension of the file, empty for a directory
+
+    :returns: Path of the file
+    """
+    safe_host = "".join(c if c.isalnum() else "_" for c in host)
+    return os.path.join(directory, f"threatq_{prefix}_{safe_host}{suffix}")
@@ -0,0 +1,120 @@
+###########################################################################################################
+# File: token_store.py
+#
+# ThreatQuotient Proprietary and Confidential
+# Copyright (c) 2016-2026 ThreatQuotient, Inc. All rights reserved.
+#
+# NOTICE: All information contained herein, is, and remains the property of ThreatQuotient, Inc.
+# The intellectual and technical concepts contained herein are proprietary to ThreatQuotient, Inc.
+# and its suppliers and may be covered by U.S. and Foreign Patents, patents in process, and are
+# protected by trade secret or copyright law.
+#
+# Dissemination of this information or reproduction of this material is strictly forbidden unless prior
+# written permission is obtained from ThreatQuotient, Inc.
+#
+# Licensed under Apache 2.0 (https://www.apache.org/licenses/LICENSE-2.0.txt)
+###########################################################################################################
+
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from logging import getLogger
+
+
+_logger = getLogger(__name__)
+
+
+class FileTokenStore:
+    """A JSON file holding OAuth tokens, shared by every process on the host
+
+    Entries are keyed by host, client ID and user (see :py:meth:`make_key`), so
+    a single file can serve several assets. Access to the token endpoint is
+    serialized with an exclusive lock on a sidecar ``.lock`` file, so that
+    concurrent action runs wait for one another instead of all requesting a
+    new token at once.
+
+    :param str path: Path of the JSON file to store the tokens in
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + ".lock"
+
+    @staticmethod
+    def make_key(host, clientid, user):
+        """Build the key an entry is stored under
+
+        :param str host: ThreatQ host, including protocol name
+        :param str clientid: OAuth client ID
+        :param str user: Email of the user, or None for client credentials
+
+        :returns: String key
+        """
+        return "|".join([host, str(clientid), str(user or "")])
+
+    @contextmanager
+    def lock(self):
+        """Hold the store's exclusive lock for the duration of the block
+
+        Yields True once the lock is held, or False if the lock file can't
+        be opened or locked (e.g. the directory isn't writable), in which
+        case the store shouldn't be used.
+        """
+        lockf = None
+        try:
+            lockf = open(self.lock_path, "a")
+            fcntl.flock(lockf, fcntl.LOCK_EX)
+        except OSError as e:
+            _logger.debug(f"Failed to lock token store {self.lock_path}: {e}")
+            if lockf is not None:
+                lockf.close()
+                lockf = None
+
+        if lockf is None:
+            yield False
+            return
+
+        with lockf:
+            try:
+                yield True
+            finally:
+                fcntl.flock(lockf, fcntl.LOCK_UN)
+
+    def _read(self):
+        try:
+            with open(self.path) as inf:
+                data = json.load(inf)
+        except (OSError, ValueError):
+            return {}
+
+        return data if isinstance(data, dict) else {}
+
+    def _write(self, data):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as outf:
+            json.dump(data, outf)
+        os.replace(tmp_path, self.path)
+
+    def load(self, key):
+        """Get a stored entry
+
+        :param str key: Key from :py:meth:`make_key`
+
+        :returns: The entry ``dict``, or None if there is no entry
+        """
+        return self._read().get(key)
+
+    def save(self, key, entry):
+        """Store an entry, replacing any previous one for the key
+
+        :param str key: Key from :py:meth:`make_key`
+        :param dict entry: JSON-serializable token information
+        """
+        data = self._read()
+        data[key] = entry
+        try:
+            self._write(data)
+        except OSError:
+            _logger.debug(f"Failed to write token store {self.path}")
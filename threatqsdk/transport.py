@@ -0,0 +1,103 @@
+###########################################################################################################
+# File: transport.py
+#
+# ThreatQuotient Proprietary and Confidential
+# Copyright (c) 2016-2026 ThreatQuotient, Inc. All rights reserved.
+#
+# NOTICE: All information contained herein, is, and remains the property of ThreatQuotient, Inc.
+# The intellectual and technical concepts contained herein are proprietary to ThreatQuotient, Inc.
+# and its suppliers and may be covered by U.S. and Foreign Patents, patents in process, and are
+# protected by trade secret or copyright law.
+#
+# Dissemination of this information or reproduction of this material is strictly forbidden unless prior
+# written permission is obtained from ThreatQuotient, Inc.
+#
+# Licensed under Apache 2.0 (https://www.apache.org/licenses/LICENSE-2.0.txt)
+###########################################################################################################
+
+import gzip
+import socket
+import zlib
+
+from requests.adapters import DEFAULT_POOLBLOCK, HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+
+# TCP keep-alive probing: start after 60s idle, probe every 15s, give up after 4 missed probes
+KEEPALIVE_IDLE = 60
+KEEPALIVE_INTERVAL = 15
+KEEPALIVE_COUNT = 4
+
+# Content encodings request bodies can be compressed with
+COMPRESSION_ENCODINGS = ("gzip", "deflate")
+
+# Bodies smaller than this aren't worth compressing
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_LEVEL = 6
+
+
+def compress_body(body, encoding):
+    """Compress a request body
+
+    :param body: Request body
+    :type body: str or bytes
+    :param str encoding: One of :py:data:`COMPRESSION_ENCODINGS`
+
+    :returns: Compressed bytes
+    """
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=COMPRESSION_LEVEL)
+
+    if encoding == "deflate":
+        return zlib.compress(body, COMPRESSION_LEVEL)
+
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def keepalive_socket_options():
+    """Build the socket options enabling TCP keep-alive on a connection
+
+    The probe timings are only set on platforms exposing them.
+
+    :returns: List of ``(level, option, value)`` tuples
+    """
+    options = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    for name, value in (("TCP_KEEPIDLE", KEEPALIVE_IDLE), ("TCP_KEEPINTVL", KEEPALIVE_INTERVAL), ("TCP_KEEPCNT", KEEPALIVE_COUNT)):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+
+    return options
+
+
+class ThreatqAdapter(HTTPAdapter):
+    """A ``requests`` transport adapter with a default timeout and
+    optional TCP keep-alive on its pooled connections.
+
+    :param int pool_connections: Number of connection pools (one per host) to cache
+    :param int pool_maxsize: Maximum number of connections kept open per host
+    :param timeout: Default timeout for requests made without one. Either
+        a number of seconds, or a ``(connect, read)`` tuple. None waits forever.
+    :param bool keepalive: If True, enable TCP keep-alive on new connections
+    """
+
+    __attrs__ = [*HTTPAdapter.__attrs__, "timeout", "keepalive"]
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, timeout=None, keepalive=False):
+        self.timeout = timeout
+        self.keepalive = keepalive
+        super().__init__(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+
+    def init_poolmanager(self, connections, maxsize, block=DEFAULT_POOLBLOCK, **pool_kwargs):
+        if self.keepalive:
+            pool_kwargs["socket_options"] = HTTPConnection.default_socket_options + keepalive_socket_options()
+
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = self.timeout
+
+        return super().send(request, timeout=timeout, **kwargs)
@@ -0,0 +1,478 @@
+###########################################################################################################
+# File: upload.py
+#
+# ThreatQuotient Proprietary and Confidential
+# Copyright (c) 2016-2026 ThreatQuotient, Inc. All rights reserved.
+#
+# NOTICE: All information contained herein, is, and remains the property of ThreatQuotient, Inc.
+# The intellectual and technical concepts contained herein are proprietary to ThreatQuotient, Inc.
+# and its suppliers and may be covered by U.S. and Foreign Patents, patents in process, and are
+# protected by trade secret or copyright law.
+#
+# Dissemination of this information or reproduction of this material is strictly forbidden unless prior
+# written permission is obtained from ThreatQuotient, Inc.
+#
+# Licensed under Apache 2.0 (https://www.apache.org/licenses/LICENSE-2.0.txt)
+###########################################################################################################
+
+import time
+from collections import namedtuple
+from logging import getLogger
+
+from requests.exceptions import ConnectionError as RequestsConnectionError, HTTPError, Timeout
+
+from . import codec
+from .exceptions import APIError, CircuitOpenError
+
+
+_logger = getLogger(__name__)
+
+# Fields identifying an object, in order of precedence
+IDENTIFIER_FIELDS = ("value", "name", "title")
+
+# Status codes telling us the server is overloaded
+OVERLOAD_STATUSES = (429, 500, 502, 503, 504)
+
+# Status codes which a few invalid objects can cause, so that splitting the batch isolates them
+SPLIT_STATUSES = (400, 413, 422)
+
+# Vocabulary naming the types of each collection, to resolve the type IDs returned by uploads
+TYPE_VOCABULARIES = {"indicators": "indicator_types", "events": "event_types", "signatures": "signature_types"}
+
+# Default limits of a consume batch
+MAX_BATCH_OBJECTS = 1000
+MAX_BATCH_BYTES = 4 * 1024 * 1024
+
+# An object which couldn't be uploaded, and why
+UploadFailure = namedtuple("UploadFailure", ["api_name", "identifier", "type", "error", "objects", "item"])
+
+
+def is_overload(error):
+    """Determine if an upload failure means the server is overloaded or unreachable
+
+    :param Exception error: The error raised by the upload
+
+    :returns: True if uploads should slow down
+    """
+    if isinstance(error, (RequestsConnectionError, Timeout, CircuitOpenError)):
+        return True
+
+    response = getattr(error, "response", None) if isinstance(error, HTTPError) else None
+    return response is not None and response.status_code in OVERLOAD_STATUSES
+
+
+def error_status(error):
+    """Get the status code of the response an upload failed with
+
+    :param Exception error: The error raised by the upload
+
+    :returns: The status code, or None if there was no response
+    """
+    return getattr(getattr(error, "response", None), "status_code", None)
+
+
+def is_splittable(error):
+    """Determine if an upload failure may be caused by some of the objects
+    uploaded only, rather than by the request as a whole (e.g. an expired
+    token, a missing permission or an unknown collection)
+
+    :param Exception error: The error raised by the upload
+
+    :returns: True if splitting the batch may isolate the failing objects
+    """
+    if isinstance(error, APIError):
+        return True
+
+    return isinstance(error, HTTPError) and error_status(error) in SPLIT_STATUSES
+
+
+def _identifier(data):
+    """Get the identifying field and value of an object
+
+    :param data: An object, or the ``dict`` of one
+    :returns: ``(field, value)``, or None if the object has no identifier
+    """
+    get = data.get if isinstance(data, dict) else lambda field: getattr(data, field, None)
+    for field in IDENTIFIER_FIELDS:
+        value = get(field)
+        if value:
+            return field, str(value).strip()
+
+    return None
+
+
+def _type_of(data):
+    """Get the type name (or ID, if there is no name) of an object
+
+    :param data: An object, or the ``dict`` of one
+    :returns: The type, or None if the object has no type
+    """
+    if isinstance(data, dict):
+        type_value = data.get("type")
+        if isinstance(type_value, dict):
+            return type_value.get("name") or type_value.get("id")
+
+        return type_value or data.get("type_id")
+
+    return data.type or data.type_id
+
+
+def object_key(obj):
+    """Build the key identifying the ThreatQ object an object would be uploaded as
+
+    :param obj: A :py:class:`~threatqsdk.bulk_object.ThreatQObject`
+
+    :returns: ``(api_name, identifier field, value, type)``, or None if the
+        object has no identifier
+    """
+    identifier = _identifier(obj)
+    if identifier is None:
+        return None
+
+    return (obj.api_name, *identifier, _type_of(obj))
+
+
+class ReconciliationIndex:
+    """Matches the objects returned by a ``consume`` upload back to the
+    objects uploaded, to give them their IDs
+
+    Objects are indexed once by ``(api_name, identifier field, value, type)``,
+    so each returned item is matched in constant time. The type is compared
+    by name; type IDs (which the API may return instead of names) are
+    resolved through ``tq.metadata`` when possible, and are compared as IDs
+    otherwise. An item is matched exactly first, then ignoring case (as the
+    API may normalize values). An item whose type can't be compared is only
+    matched if all the uploaded objects with its value have the same type.
+    Every uploaded object with the item's identifier and type is given its ID.
+
+    :param list objects: The :py:class:`~threatqsdk.bulk_object.ThreatQObject` to upload
+    :param tq: ThreatQ connection, to resolve type IDs
+    :type tq: ~threatqsdk.Threatq
+    """
+
+    def __init__(self, objects, tq=None):
+        self.objects = [obj for obj in objects if obj]
+        self.tq = tq
+        self.unmatched_items = []
+
+        self._type_names = {}
+        self._typed = {}
+        self._untyped = {}
+        for obj in self.objects:
+            types = self._types(obj.api_name, obj)
+            for base in self._bases(obj.api_name, obj):
+                for type_value in types:
+                    self._typed.setdefault((*base, type_value), []).append(obj)
+                group = types[0] if types else None
+                self._untyped.setdefault(base, {}).setdefault(group, []).append(obj)
+
+    def _type_name(self, api_name, type_id):
+        """Resolve a type ID to its name, None if it can't be resolved"""
+        vocabulary = TYPE_VOCABULARIES.get(api_name)
+        if self.tq is None or vocabulary is None:
+            return None
+
+        key = (api_name, type_id)
+        if key not in self._type_names:
+            try:
+                self._type_names[key] = self.tq.metadata.name_of(vocabulary, type_id)
+            except Exception as e:
+                _logger.debug(f"Failed to resolve {vocabulary} {type_id}: {e}")
+                self._type_names[key] = None
+
+        return self._type_names[key]
+
+    def _types(self, api_name, data):
+        """Get the type name and ``("id", type ID)`` of an object, if known, name first
+
+        :param data: An object, or the ``dict`` of one
+        """
+        if isinstance(data, dict):
+            type_value = data.get("type")
+            type_id = data.get("type_id")
+            if isinstance(type_value, dict):
+                type_id = type_value.get("id", type_id)
+                type_value = type_value.get("name")
+            elif isinstance(type_value, int):
+                type_id, type_value = type_value, None
+        else:
+            type_value, type_id = data.type, data.type_id
+
+        if not type_value and type_id is not None:
+            type_value = self._type_name(api_name, type_id)
+
+        types = []
+        if type_value:
+            types.append(type_value)
+        if type_id is not None:
+            types.append(("id", type_id))
+        return types
+
+    @staticmethod
+    def _bases(api_name, data):
+        """Build the typeless keys of an object, from the most to the least specific"""
+        identifier = _identifier(data)
+        if identifier is None:
+            return []
+
+        field, value = identifier
+        return [(api_name, field, value, False), (api_name, field, value.casefold(), True)]
+
+    def match(self, api_name, item):
+        """Find the uploaded objects a returned item corresponds to
+
+        :param str api_name: API name of the collection uploaded to
+        :param dict item: An item returned by the API
+
+        :returns: List of matching objects, empty if there is none
+        """
+        api_name = item.get("api_name") or api_name
+        types = self._types(api_name, item)
+        for base in self._bases(api_name, item):
+            for type_value in types:
+                objects = self._typed.get((*base, type_value))
+                if objects:
+                    return objects
+
+            # Without a comparable type, only match a value uploaded with a single type
+            groups = self._untyped.get(base)
+            if groups and len(groups) == 1:
+                return next(iter(groups.values()))
+
+        return []
+
+    def assign(self, api_name, items):
+        """Give the uploaded objects the IDs of the items returned for them
+
+        Items matching no object are recorded in :py:attr:`unmatched_items`.
+
+        :param str api_name: API name of the collection uploaded to
+        :param list items: Items returned by the API
+
+        :returns: Number of items matched
+        """
+        matched = 0
+        for item in items:
+            objects = self.match(api_name, item)
+            if not objects:
+                self.unmatched_items.append(item)
+                continue
+
+            for obj in objects:
+                obj._set_id(item.get("id"))
+            matched += 1
+
+        return matched
+
+    def missing_ids(self):
+        """Get the uploaded objects which weren't given an ID
+
+        :returns: List of objects
+        """
+        return [obj for obj in self.objects if not obj.oid]
+
+    def report(self):
+        """Log any returned item or uploaded object which couldn't be reconciled"""
+        if self.unmatched_items:
+            sample = [_identifier(item) for item in self.unmatched_items[:5]]
+            _logger.warning(f"{len(self.unmatched_items)} uploaded item(s) matched no object, e.g. {sample}")
+
+        missing = self.missing_ids()
+        if missing:
+            sample = [_identifier(obj) for obj in missing[:5]]
+            _logger.warning(f"{len(missing)} object(s) got no ID from the upload, e.g. {sample}")
+
+
+def encode_batch(pieces):
+    """Assemble a request body from objects serialized by :py:meth:`BatchSizer.measure`
+
+    :param list pieces: JSON bytes of each object
+
+    :returns: JSON bytes of the list of objects
+    """
+    return b"[" + b",".join(pieces) + b"]"
+
+
+def describe_error(error):
+    """Get a short description of an upload failure
+
+    :param Exception error: The error raised by the upload
+
+    :returns: Description string
+    """
+    if isinstance(error, APIError) and error.errors:
+        return f"{type(error).__name__}: {error.errors}"
+
+    return f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+
+
+class UploadReport:
+    """Collects the objects which failed to upload, for the caller to report
+
+    A single report can be passed to several uploads to collect all of
+    their failures.
+    """
+
+    def __init__(self):
+        self.failures = []
+
+    def add(self, api_name, items, error, index=None):
+        """Record the items of a batch as failed
+
+        :param str api_name: API name of the collection uploaded to
+        :param list items: The serialized objects (``dict``) which failed
+        :param Exception error: The error raised by the upload
+        :param ReconciliationIndex index: Index to find the uploaded objects
+            the items were serialized from
+        """
+        for item in items:
+            field_value = _identifier(item)
+            self.failures.append(
+                UploadFailure(
+                    api_name,
+                    field_value[1] if field_value else None,
+                    _type_of(item),
+                    error,
+                    index.match(api_name, item) if index else [],
+                    item,
+                )
+            )
+
+    def summary(self):
+        """Describe the failures in a JSON-serializable form
+
+        :returns: List of ``dict`` with the ``api_name``, ``value``, ``type``
+            and ``error`` of each failed object
+        """
+        return [
+            {"api_name": failure.api_name, "value": failure.identifier, "type": failure.type, "error": describe_error(failure.error)}
+            for failure in self.failures
+        ]
+
+
+class PacingController:
+    """Adapts the pause between upload batches to how the server copes
+
+    Each batch's latency and outcome is recorded. The pause halves after a
+    batch which was answered within ``target_latency`` seconds, and doubles
+    (up to ``max_delay``) after a slow batch, or one failing because the
+    server is overloaded or unreachable. Other failures, such as a rejected
+    payload, say nothing about the server's health and leave it unchanged.
+
+    :param float target_latency: Batch latency, in seconds, above which the
+        server is considered busy
+    :param float min_delay: Shortest pause between batches, in seconds
+    :param float max_delay: Longest pause between batches, in seconds
+    :param float initial_delay: Pause before any batch was recorded
+    """
+
+    def __init__(self, target_latency=10, min_delay=0, max_delay=30, initial_delay=0):
+        self.target_latency = target_latency
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.delay = initial_delay
+        self.latency = None
+
+    def record(self, latency, error=None):
+        """Record the outcome of a batch, and adapt the pause accordingly
+
+        :param float latency: Seconds the batch took
+        :param Exception error: The error raised by the batch, if any
+        """
+        self.latency = latency
+        if (error is not None and is_overload(error)) or latency > self.target_latency:
+            self.delay = min(self.max_delay, max(self.delay * 2, 1))
+        elif error is None:
+            self.delay = self.delay / 2 if self.delay >= 0.1 else 0
+
+        self.delay = max(self.min_delay, self.delay)
+
+    def wait(self):
+        """Pause before the next batch"""
+        _logger.debug(f"Last batch took {self.latency or 0:.2f}s. Waiting {self.delay:.2f}s before the next batch")
+        if self.delay:
+            time.sleep(self.delay)
+
+
+class BatchSizer:
+    """Cuts uploads into batches by object count and serialized size
+
+    A batch holds at most ``limit`` objects and ``max_bytes`` bytes of JSON
+    (an object larger than ``max_bytes`` goes in a batch of its own). The
+    ``limit`` starts at ``initial_objects`` and adapts to the latency of
+    each batch: it halves after a batch slower than ``target_latency``, or
+    failing because the server is overloaded or unreachable, and grows by
+    half, up to ``max_objects``, after a batch taking less than half of it.
+
+    :param int max_objects: Maximum number of objects in a batch
+    :param int max_bytes: Maximum size of a batch, in bytes of JSON
+    :param int initial_objects: Number of objects in the first batch
+    :param float target_latency: Batch latency, in seconds, to stay under
+    """
+
+    def __init__(self, max_objects=MAX_BATCH_OBJECTS, max_bytes=MAX_BATCH_BYTES, initial_objects=500, target_latency=10):
+        self.max_objects = max(1, max_objects)
+        self.max_bytes = max_bytes
+        self.target_latency = target_latency
+        self.limit = max(1, min(initial_objects, self.max_objects))
+
+    @staticmethod
+    def measure(data):
+        """Serialize each object to JSON, lazily
+
+        The JSON is kept to build the request body with
+        :py:func:`encode_batch`, so objects are only serialized once.
+
+        :param data: Iterable of serialized objects (``dict``)
+
+        :returns: Generator of ``(JSON bytes, size in bytes)``
+        """
+        for item in data:
+            piece = codec.dumpb(item)
+            yield piece, len(piece)
+
+    def batches(self, items):
+        """Cut objects into batches
+
+        Batches are cut lazily, so objects are only serialized as their batch
+        is needed, and each batch follows the ``limit`` current when it is cut.
+
+        :param items: Iterable of ``(object, size)``, e.g. from :py:meth:`measure`
+
+        :returns: Generator of lists of objects
+        """
+        items = iter(items)
+        pending = None
+        while True:
+            batch = []
+            total = 2  # The enclosing brackets
+            if pending is not None:
+                batch.append(pending[0])
+                total += pending[1] + 1
+                pending = None
+
+            for item, size in items:
+                if len(batch) >= self.limit or (batch and total + size + 1 > self.max_bytes):
+                    pending = (item, size)
+                    break
+                batch.append(item)
+                total += size + 1
+
+            if not batch:
+                return
+
+            yield batch
+
+    def record(self, count, latency, error=None):
+        """Record the outcome of a batch, and adapt the batch size accordingly
+
+        :param int count: Number of objects in the batch
+        :param float latency: Seconds the batch took
+        :param Exception error: The error raised by the batch, if any
+        """
+        if (error is not None and is_overload(error)) or latency > self.target_latency:
+            self.limit = max(1, min(self.limit, count) // 2)
+        elif error is None and latency < self.target_latency / 2 and count >= self.limit:
+            self.limit = min(self.max_objects, self.limit + max(1, self.limit // 2))
+
+        _logger.debug(f"Batch of {count} object(s) took {latency:.2f}s. Next batches hold up to {self.limit} object(s)")